@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -40,7 +41,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django_filters',
     'rest_framework',
-    'debug_toolbar',
     'djoser',
     'tags',
     'store',
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +58,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
 ROOT_URLCONF = 'StoreFront.urls'
@@ -93,6 +94,34 @@ DATABASES = {
     }
 }
 
+# Read replicas (core.routers). Safe requests on views using ReadReplicaMixin
+# read from one of REPLICAS; a client that wrote stays on the primary for
+# STICKY_SECONDS (cookie, plus a per-user cache entry for token clients).
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_ROUTING = {
+    'REPLICAS': [],
+    'STICKY_SECONDS': 5,
+    # Must name a cache shared by every process (Redis, Memcached): on the
+    # local-memory default, a token client is pinned only in the process that
+    # took its write and may read stale rows from the others.
+    'CACHE_ALIAS': 'default',
+}
+
+# Local stand-in: two SQLite files, refreshed with `manage.py sync_replica`.
+if os.environ.get('STOREFRONT_SQLITE_REPLICA'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db-replica.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+    REPLICA_ROUTING['REPLICAS'] = ['replica']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -138,10 +167,26 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
 }
 
+# In-process cache of verified access tokens and their users
+# (core.authentication). Saves and deletes evict the user in the process that
+# made them; other processes see the change within TIMEOUT seconds.
+AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
+# In-process cache of each user's customer id (store.customers). Users without
+# a customer profile are looked up on every request; a deleted profile is
+# evicted in the process that deleted it and elsewhere after TIMEOUT seconds.
+CUSTOMER_ID_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
 SIMPLE_JWT = {
    'AUTH_HEADER_TYPES': ('JWT',),
 "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
@@ -153,8 +198,13 @@ DJOSER  = {
         'current_user': 'core.serializers.UserSerializer',
     }
 }
-# debug toolbar
-import os
+# debug toolbar: development only, its per-request SQL capture is far too
+# expensive to run in production.
+from importlib.util import find_spec
+DEBUG_TOOLBAR = DEBUG and find_spec('debug_toolbar') is not None
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
 INTERNAL_IPS = ["127.0.0.1"]
 
 import mimetypes
@@ -165,3 +215,71 @@ DEBUG_TOOLBAR_CONFIG = {
 }
 
 AUTH_USER_MODEL = 'core.User'
+
+# ModelBackend with user and group permissions cached in a shared cache
+# (core.backends), invalidated by group and permission membership changes.
+AUTHENTICATION_BACKENDS = ['core.backends.CachedModelBackend']
+PERMISSION_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Product search: 'auto' picks MySQL FULLTEXT or SQLite FTS5 from the database
+# vendor; 'python' forces the in-process inverted index.
+STORE_SEARCH_BACKEND = 'auto'
+
+# Conditional GET and response-data cache for product and collection reads
+# (store.caching). Entries are invalidated by signals, so ALIAS must name a
+# cache shared by every process (Redis, Memcached). Enable it once one is
+# configured; on a per-process local-memory cache it stays off (warning
+# store.W001) unless ALLOW_LOCAL_MEMORY is set for a single-process server.
+STORE_RESPONSE_CACHE = {
+    'ENABLED': False,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'ALLOW_LOCAL_MEMORY': False,
+}
+
+# Serve product list/detail, collection list and cart retrieve GETs from
+# async views (store.async_views). Enable when running under ASGI; under WSGI
+# each async view would need its own event loop.
+STORE_ASYNC_READS = False
+
+# Admin changelists for big tables (store.admin): estimated page counts (table
+# statistics on MySQL, at most COUNT_CAP rows elsewhere) and prefix searches.
+STORE_ADMIN = {
+    'LARGE_TABLES': False,
+    'COUNT_CAP': 10000,
+}
+
+# Per-request query instrumentation (core.middleware). Budgets are keyed by
+# URL name ('products-list') or method and URL name ('GET products-list');
+# requests over budget are logged, or raise QueryBudgetExceeded when
+# RAISE_ON_BUDGET is set (use it in test settings). Aggregates are served to
+# admins at /core/query-stats/.
+QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    'DEFAULT_BUDGET': None,
+    'RAISE_ON_BUDGET': False,
+    'BUDGETS': {
+        'GET products-list': 7,
+        'GET products-detail': 6,
+        'GET product-reviews-list': 3,
+        'GET collection-list': 3,
+        'GET collection-detail': 3,
+        'GET carts-detail': 4,
+        'GET cart-items-list': 3,
+        'GET orders-list': 5,
+        'GET orders-detail': 5,
+        'POST orders-list': 18,
+        'GET customers-list': 4,
+        'GET customers-me': 4,
+    },
+}
+
+# Abandoned carts are deleted by `manage.py purge_carts` (store.tasks.purge_abandoned_carts).
+CART_PURGE = {
+    'TTL_DAYS': 30,
+    'CHUNK_SIZE': 500,
+    'PAUSE': 0.05,
+}
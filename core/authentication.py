@@ -0,0 +1,95 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_CACHE', {})}
+
+
+class LRUCache:
+    """A thread-safe, size-bounded LRU mapping whose entries also expire."""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = LRUCache(get_config()['MAX_ENTRIES'])
+user_cache = LRUCache(get_config()['MAX_ENTRIES'])
+
+
+def invalidate_user(user_id):
+    user_cache.delete(str(user_id))
+
+
+def clear_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that remembers, in this process, the tokens it has
+    verified (until they expire, at most TIMEOUT seconds) and the active users
+    they resolve to, so a repeat request costs neither a signature check nor a
+    user query.
+
+    Saving or deleting a user evicts it here (core.signals). Other processes
+    and queryset.update() writes are only picked up once the entry times out,
+    so keep AUTH_CACHE['TIMEOUT'] short.
+    """
+    def get_validated_token(self, raw_token):
+        token = token_cache.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            timeout = min(get_config()['TIMEOUT'], token.get('exp', 0) - time.time())
+            if timeout > 0:
+                token_cache.set(raw_token, token, timeout)
+        return token
+
+    def get_user(self, validated_token):
+        key = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user, get_config()['TIMEOUT'])
+        # A copy, so per-request state (permission caches, attributes set by
+        # views) never leaks into the shared instance.
+        return copy.copy(user)
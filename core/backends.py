@@ -0,0 +1,64 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+VERSION_KEY = 'core:perms:version'
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PERMISSION_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def user_key(user_id):
+    return f'core:perms:user:{user_id}'
+
+
+def invalidate_permissions(user_ids=None):
+    """Forget the cached permissions of `user_ids`, or of every user."""
+    if user_ids is None:
+        get_cache().set(VERSION_KEY, uuid4().hex, None)
+    else:
+        get_cache().delete_many([user_key(pk) for pk in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose user and group permission names are kept in a shared
+    cache, so checks in a fresh process or on a fresh user instance cost one
+    cache read instead of two queries.
+
+    Entries are dropped per user when the user is saved or deleted or their
+    groups or direct permissions change, and all at once (through VERSION_KEY) when a group's permissions
+    change or a group or permission is deleted; see core.signals.
+    """
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            user_obj._perm_cache = self.get_cached_permissions(user_obj)
+        return user_obj._perm_cache
+
+    def get_cached_permissions(self, user_obj):
+        cache = get_cache()
+        key = user_key(user_obj.pk)
+        entries = cache.get_many([VERSION_KEY, key])
+        version = entries.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        elif key in entries and entries[key][0] == version:
+            return entries[key][1]
+        permissions = super().get_all_permissions(user_obj)
+        cache.set(key, (version, permissions), get_config()['TIMEOUT'])
+        return permissions
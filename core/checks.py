@@ -0,0 +1,17 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+from . import routers
+
+
+@register()
+def check_pin_cache(app_configs, **kwargs):
+    config = routers.get_config()
+    if not config['REPLICAS'] or not isinstance(routers.get_pin_cache(), LocMemCache):
+        return []
+    return [Warning(
+        f"REPLICA_ROUTING['CACHE_ALIAS'] '{config['CACHE_ALIAS']}' is per-process, so a token client is "
+        "kept on the primary after a write only by the process that took it.",
+        hint="Point CACHE_ALIAS at a shared cache.",
+        id='core.W001',
+    )]
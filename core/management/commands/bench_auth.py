@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import CachedJWTAuthentication, clear_caches
+from store.benchmarks import format_table, measure
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request JWT authentication cost with and without the token/user cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rows = []
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username='bench-auth', email='bench-auth@example.com',
+                                                        password='bench-auth')
+            request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+            paths = [
+                ('JWTAuthentication', JWTAuthentication(), None),
+                ('CachedJWTAuthentication (cold)', CachedJWTAuthentication(), clear_caches),
+                ('CachedJWTAuthentication (warm)', CachedJWTAuthentication(), None),
+            ]
+            clear_caches()
+            for name, authenticator, setup in paths:
+                if setup:
+                    setup()
+                authenticator.authenticate(request)
+                if setup:
+                    setup()
+                with CaptureQueriesContext(connection) as queries:
+                    authenticator.authenticate(request)
+                stats = measure(lambda *args: authenticator.authenticate(request), repeat=options['repeat'],
+                                setup=setup)
+                stats.update(path=name, queries=len(queries))
+                rows.append(stats)
+            clear_caches()
+            transaction.set_rollback(True)
+        self.stdout.write(format_table(rows, ['path', 'queries', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']))
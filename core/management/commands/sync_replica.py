@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import get_config
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database over the local replica files (STOREFRONT_SQLITE_REPLICA).'
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        replicas = get_config()['REPLICAS']
+        if not replicas:
+            raise CommandError('No replicas configured in REPLICA_ROUTING.')
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas are synced here; real replicas use database replication.')
+        primary.ensure_connection()
+        for alias in replicas:
+            replica = connections[alias]
+            replica.ensure_connection()
+            start = time.perf_counter()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f'{alias}: synced in {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import SAFE_METHODS
+
+from . import routers
+
+logger = logging.getLogger('storefront.queries')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DEFAULT_BUDGET': None,
+    'BUDGETS': {},
+    'RAISE_ON_BUDGET': False,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_INSTRUMENTATION', {})}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed once per connection; the context variable follows the request
+    # into sync_to_async threads, so async views are recorded too.
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryRecorder:
+    """Execute wrapper that times every statement sent on a request."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+
+class EndpointStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, recorder, wall_time, over_budget):
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'duplicates': 0,
+                'db_time': 0.0, 'wall_time': 0.0, 'max_wall_time': 0.0, 'over_budget': 0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['duplicates'] += recorder.duplicates
+            stats['db_time'] += recorder.time
+            stats['wall_time'] += wall_time
+            stats['max_wall_time'] = max(stats['max_wall_time'], wall_time)
+            stats['over_budget'] += over_budget
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self._endpoints.items()}
+        for stats in endpoints.values():
+            requests = stats['requests']
+            stats['avg_queries'] = round(stats['queries'] / requests, 2)
+            stats['avg_db_ms'] = round(stats['db_time'] / requests * 1000, 3)
+            stats['avg_wall_ms'] = round(stats['wall_time'] / requests * 1000, 3)
+            stats['max_wall_ms'] = round(stats.pop('max_wall_time') * 1000, 3)
+            del stats['db_time'], stats['wall_time']
+        return endpoints
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+def get_endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return f'{request.method} {match.view_name}'
+
+
+def get_budget(config, request):
+    budgets = config['BUDGETS']
+    match = request.resolver_match
+    return budgets.get(f'{request.method} {match.view_name}', budgets.get(match.view_name, config['DEFAULT_BUDGET']))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records query count, DB time, duplicate statements and wall time for each
+    resolved endpoint and enforces the budgets in QUERY_INSTRUMENTATION.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Mark the instance as a coroutine function, as MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(install_query_recorder, dispatch_uid='core.install_query_recorder')
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.record(config, request, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.record(config, request, recorder, time.perf_counter() - start)
+        return response
+
+    def record(self, config, request, recorder, wall_time):
+        endpoint = get_endpoint(request)
+        if endpoint is None:
+            return
+        budget = get_budget(config, request)
+        over_budget = budget is not None and recorder.count > budget
+        endpoint_stats.record(endpoint, recorder, wall_time, over_budget)
+        if over_budget:
+            message = f'{endpoint} ran {recorder.count} queries (budget {budget}, {recorder.duplicates} duplicates)'
+            if config['RAISE_ON_BUDGET']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+class ReplicaStickinessMiddleware:
+    """Pins clients to the primary for a while after a successful write."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and 200 <= response.status_code < 400 \
+                and routers.get_config()['REPLICAS']:
+            routers.pin(request, response)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['first_name', 'last_name'], name='core_user_name_idx'),
+        ),
+    ]
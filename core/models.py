@@ -3,4 +3,9 @@ from django.contrib.auth.models import AbstractUser
 
 # Create your models here.
 class User(AbstractUser):
-    email = models.EmailField(unique=True)
\ No newline at end of file
+    email = models.EmailField(unique=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['first_name', 'last_name'], name='core_user_name_idx'),
+        ]
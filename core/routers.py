@@ -0,0 +1,107 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULTS = {
+    'REPLICAS': [],
+    'STICKY_SECONDS': 5,
+    'COOKIE_NAME': 'sf_primary_until',
+    # Pins of token clients, which send no cookie (see core.W001).
+    'CACHE_ALIAS': 'default',
+}
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REPLICA_ROUTING', {})}
+
+
+def get_read_alias():
+    """The replica the current request reads from, or None for the primary."""
+    return _read_alias.get()
+
+
+def get_pin_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def pin_key(user_id):
+    return f'core:primary:{user_id}'
+
+
+def is_pinned(request):
+    config = get_config()
+    try:
+        if float(request.COOKIES.get(config['COOKIE_NAME'], 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and get_pin_cache().get(pin_key(user.pk)))
+
+
+def pin(request, response):
+    """Keep this client's reads on the primary until its write has replicated."""
+    config = get_config()
+    seconds = config['STICKY_SECONDS']
+    response.set_cookie(config['COOKIE_NAME'], f'{time.time() + seconds:.3f}',
+                        max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        get_pin_cache().set(pin_key(user.pk), True, seconds)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica chosen for the current request and everything
+    else to the primary. Writes always go to the primary, even for instances
+    that were loaded from a replica.
+    """
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *get_config()['REPLICAS']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReadReplicaMixin:
+    """
+    Serves safe-method requests from a replica, unless the client wrote
+    recently (see `pin`). Authentication and permission checks still read
+    from the primary.
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replicas = get_config()['REPLICAS']
+        if replicas and request.method in SAFE_METHODS and not is_pinned(request):
+            # Not reset with a token: async views may run initial() in a
+            # sync_to_async thread, whose context is copied back.
+            _read_alias.set(random.choice(replicas))
+            self._reads_from_replica = True
+
+    def release_read_alias(self):
+        if getattr(self, '_reads_from_replica', False):
+            _read_alias.set(None)
+            self._reads_from_replica = False
+
+    def handle_exception(self, exc):
+        # An exception DRF does not handle is re-raised from here and skips
+        # finalize_response(); the thread's next request must not inherit
+        # the replica.
+        self.release_read_alias()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        self.release_read_alias()
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .backends import invalidate_permissions
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def evict_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    # is_superuser and is_active decide permissions too.
+    invalidate_permissions([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def evict_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_permissions([instance.pk])
+    else:
+        # pk_set is None when cleared from the group or permission side.
+        invalidate_permissions(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def evict_group_permissions(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_permissions()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def evict_all_permissions(sender, **kwargs):
+    invalidate_permissions()
@@ -1,3 +1,260 @@
-from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
+from rest_framework.views import APIView
+
+from . import routers
+from .middleware import QueryBudgetExceeded, endpoint_stats
+
+
+def two_queries(request):
+    get_user_model().objects.exists()
+    get_user_model().objects.count()
+    return HttpResponse()
+
+
+class ReadAliasView(routers.ReadReplicaMixin, APIView):
+    def get(self, request):
+        return Response({'read': routers.get_read_alias(), 'users': get_user_model().objects.all().db})
+
+    def post(self, request):
+        return Response({'read': routers.get_read_alias()})
+
+
+class CountUsersView(ReadAliasView):
+    def get(self, request):
+        return Response({'count': get_user_model().objects.count()})
+
+
+class FailingReadView(ReadAliasView):
+    def get(self, request):
+        raise RuntimeError('read failed')
+
+
+urlpatterns = [
+    path('two-queries/', two_queries, name='two-queries'),
+    path('read-alias/', ReadAliasView.as_view(), name='read-alias'),
+    path('count-users/', CountUsersView.as_view(), name='count-users'),
+    path('failing-read/', FailingReadView.as_view(), name='failing-read'),
+]
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests-default'},
+    'permissions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests-permissions'},
+    'pins': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests-pins'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES, PERMISSION_CACHE={'ALIAS': 'permissions', 'TIMEOUT': 300})
+class CachedModelBackendTests(TestCase):
+    """A check on a fresh user instance costs two queries cold and none warm, until a membership changes."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='support', password='secret', is_staff=True)
+        cls.group = Group.objects.create(name='support')
+        cls.permission = Permission.objects.get(codename='change_customer')
+
+    def setUp(self):
+        caches['permissions'].clear()
+
+    def has_perm(self, queries):
+        # A new instance each time, as each request loads the user afresh.
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(queries):
+            return user.has_perm('store.change_customer')
+
+    def test_cold_then_warm(self):
+        self.assertFalse(self.has_perm(2))
+        self.assertFalse(self.has_perm(0))
+
+    def test_user_permission_added(self):
+        self.has_perm(2)
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.has_perm(2))
+        self.assertTrue(self.has_perm(0))
+
+    def test_group_membership_changed(self):
+        self.group.permissions.add(self.permission)
+        self.assertFalse(self.has_perm(2))
+        self.user.groups.add(self.group)
+        self.assertTrue(self.has_perm(2))
+        self.user.groups.remove(self.group)
+        self.assertFalse(self.has_perm(2))
+
+    def test_group_permission_changed(self):
+        self.user.groups.add(self.group)
+        self.assertFalse(self.has_perm(2))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.has_perm(2))
+        self.group.permissions.remove(self.permission)
+        self.assertFalse(self.has_perm(2))
+
+    def test_superuser_demoted(self):
+        self.user.is_superuser = True
+        self.user.save()
+        # has_perm() skips the backend for superusers; the admin's index does not.
+        self.assertIn('store.change_customer', get_user_model().objects.get(pk=self.user.pk).get_all_permissions())
+        self.user.is_superuser = False
+        self.user.save()
+        self.assertFalse(self.has_perm(2))
+
+    def test_user_deactivated(self):
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.has_perm(2))
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.has_perm(0))
+        self.user.is_active = True
+        self.user.save()
+        self.assertTrue(self.has_perm(2))
+
+    def test_permission_cleared_from_its_side(self):
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.has_perm(2))
+        self.permission.user_set.clear()
+        self.assertFalse(self.has_perm(2))
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class QueryInstrumentationMiddlewareTests(TestCase):
+    def setUp(self):
+        endpoint_stats.reset()
+
+    def get(self, **config):
+        with override_settings(QUERY_INSTRUMENTATION={'ENABLED': True, **config}):
+            return self.client.get('/two-queries/')
+
+    def test_under_budget(self):
+        response = self.get(BUDGETS={'GET two-queries': 2}, RAISE_ON_BUDGET=True)
+        self.assertEqual(response.status_code, 200)
+        stats = endpoint_stats.snapshot()['GET two-queries']
+        self.assertEqual((stats['queries'], stats['over_budget']), (2, 0))
+
+    def test_over_budget_raises_when_enforced(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'GET two-queries ran 2 queries (budget 1'), \
+                self.assertLogs('django.request', 'ERROR'):
+            self.get(BUDGETS={'GET two-queries': 1}, RAISE_ON_BUDGET=True)
+
+    def test_over_default_budget_raises_when_enforced(self):
+        with self.assertRaises(QueryBudgetExceeded), self.assertLogs('django.request', 'ERROR'):
+            self.get(DEFAULT_BUDGET=1, RAISE_ON_BUDGET=True)
+
+    def test_path_budget_overrides_default(self):
+        response = self.get(DEFAULT_BUDGET=1, BUDGETS={'two-queries': 2}, RAISE_ON_BUDGET=True)
+        self.assertEqual(response.status_code, 200)
+
+    def test_over_budget_logs_when_not_enforced(self):
+        with self.assertLogs('storefront.queries', 'WARNING') as logs:
+            response = self.get(BUDGETS={'GET two-queries': 1}, RAISE_ON_BUDGET=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('GET two-queries ran 2 queries (budget 1', logs.output[0])
+        self.assertEqual(endpoint_stats.snapshot()['GET two-queries']['over_budget'], 1)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.addCleanup(routers._read_alias.set, None)
+
+    def test_reads_follow_the_request(self):
+        User = get_user_model()
+        self.assertIsNone(self.router.db_for_read(User))
+        routers._read_alias.set('replica')
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+        self.assertEqual(self.router.db_for_write(User), 'default')
+
+    @override_settings(REPLICA_ROUTING={'REPLICAS': ['replica']})
+    def test_relations_across_primary_and_replicas(self):
+        User = get_user_model()
+        primary, replica, other = User(), User(), User()
+        primary._state.db, replica._state.db, other._state.db = 'default', 'replica', 'other'
+        self.assertTrue(self.router.allow_relation(primary, replica))
+        self.assertIsNone(self.router.allow_relation(primary, other))
+
+
+@override_settings(ROOT_URLCONF='core.tests', CACHES=LOCAL_CACHES,
+                   REPLICA_ROUTING={'REPLICAS': ['replica'], 'STICKY_SECONDS': 5, 'CACHE_ALIAS': 'pins'})
+class ReadReplicaMixinTests(APITestCase):
+    """Routing decisions only; ReplicaDatabaseTests runs queries against a second database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='writer', password='secret')
+
+    def setUp(self):
+        caches['pins'].clear()
+
+    def read_alias(self):
+        response = self.client.get('/read-alias/')
+        self.assertEqual(response.data['users'], response.data['read'] or 'default')
+        self.assertIsNone(routers.get_read_alias())
+        return response.data['read']
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertEqual(self.read_alias(), 'replica')
+
+    def test_unhandled_exception_releases_the_replica(self):
+        with self.assertRaisesMessage(RuntimeError, 'read failed'), self.assertLogs('django.request', 'ERROR'):
+            self.client.get('/failing-read/')
+        self.assertIsNone(routers.get_read_alias())
+
+    def test_writes_stay_on_the_primary(self):
+        response = self.client.post('/read-alias/')
+        self.assertIsNone(response.data['read'])
+        self.assertIsNone(routers.get_read_alias())
+
+    def test_cookie_pins_after_a_write(self):
+        self.client.post('/read-alias/')
+        self.assertIn(routers.get_config()['COOKIE_NAME'], self.client.cookies)
+        self.assertIsNone(self.read_alias())
+
+    def test_expired_or_invalid_cookie_does_not_pin(self):
+        for value in ['1', 'soon']:
+            self.client.cookies[routers.get_config()['COOKIE_NAME']] = value
+            self.assertEqual(self.read_alias(), 'replica')
+
+    def test_token_client_pinned_through_the_cache(self):
+        self.client.force_authenticate(self.user)
+        self.client.post('/read-alias/')
+        # Token clients do not send the cookie back.
+        self.client.cookies.clear()
+        self.assertIsNone(self.read_alias())
+        caches['pins'].clear()
+        self.assertEqual(self.read_alias(), 'replica')
+
+    def test_anonymous_client_is_not_pinned_without_its_cookie(self):
+        self.client.post('/read-alias/')
+        self.client.cookies.clear()
+        self.assertEqual(self.read_alias(), 'replica')
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs a replica database, e.g. STOREFRONT_SQLITE_REPLICA=1')
+@override_settings(ROOT_URLCONF='core.tests', CACHES=LOCAL_CACHES,
+                   REPLICA_ROUTING={'REPLICAS': ['replica'], 'STICKY_SECONDS': 5, 'CACHE_ALIAS': 'pins'})
+class ReplicaDatabaseTests(APITestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        caches['pins'].clear()
+
+    def queries(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/count-users/')
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica_until_a_write(self):
+        self.assertEqual(self.queries(), (0, 1))
+        self.client.post('/count-users/')
+        self.assertEqual(self.queries(), (1, 0))
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+# URLConf
+urlpatterns = [
+    path('query-stats/', views.query_stats, name='query-stats'),
+]
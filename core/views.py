@@ -1,3 +1,12 @@
-from django.shortcuts import render
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
-# Create your views here.
+from .middleware import endpoint_stats
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def query_stats(request):
+    if request.method == 'DELETE':
+        endpoint_stats.reset()
+    return Response(endpoint_stats.snapshot())
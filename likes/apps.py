@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LikesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'likes'
+
+    def ready(self) -> None:
+        from . import signals
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from likes.models import LikeCount
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the like counters from LikedItem, after writes that bypassed its signals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        LikeCount.objects.using(options['database']).rebuild()
+        total = LikeCount.objects.using(options['database']).count()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} like counters in {time.perf_counter() - start:.2f}s.'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='likeditem',
+            index=models.Index(fields=['content_type', 'object_id'], name='likes_likeditem_target_idx'),
+        ),
+    ]
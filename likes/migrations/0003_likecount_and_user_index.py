@@ -0,0 +1,48 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:44
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_likes(apps, schema_editor):
+    LikedItem = apps.get_model('likes', 'LikedItem')
+    LikeCount = apps.get_model('likes', 'LikeCount')
+    counts = LikedItem.objects.order_by().values_list('content_type_id', 'object_id').annotate(count=Count('pk'))
+    LikeCount.objects.bulk_create([
+        LikeCount(content_type_id=content_type_id, object_id=object_id, count=count)
+        for content_type_id, object_id, count in counts
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('likes', '0002_add_likeditem_target_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='likeditem',
+            index=models.Index(fields=['user', 'content_type', 'object_id'], name='likes_likeditem_user_idx'),
+        ),
+        migrations.AddField(
+            model_name='likecount',
+            name='content_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype'),
+        ),
+        migrations.AddConstraint(
+            model_name='likecount',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id'), name='likes_likecount_target_uniq'),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:18
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    LikedItem = apps.get_model('likes', 'LikedItem')
+    LikeCount = apps.get_model('likes', 'LikeCount')
+    duplicates = LikedItem.objects.order_by().values('user_id', 'content_type_id', 'object_id') \
+        .annotate(keep=Min('pk'), likes=Count('pk')).filter(likes__gt=1)
+    for row in list(duplicates):
+        target = {'content_type_id': row['content_type_id'], 'object_id': row['object_id']}
+        LikedItem.objects.filter(user_id=row['user_id'], **target).exclude(pk=row['keep']).delete()
+        LikeCount.objects.filter(**target).update(count=F('count') - (row['likes'] - 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0003_likecount_and_user_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='likes_likeditem_user_uniq'),
+        ),
+        migrations.RemoveIndex(
+            model_name='likeditem',
+            name='likes_likeditem_user_idx',
+        ),
+    ]
@@ -1,13 +1,76 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 # Create your models here.
+class LikedItemQuerySet(models.QuerySet):
+    def liked_by(self, user, model, ids):
+        """The subset of `ids` (objects of `model`) that `user` likes, in one query."""
+        if not user.is_authenticated or not ids:
+            return set()
+        content_type = ContentType.objects.db_manager(self.db).get_for_model(model)
+        return set(self.filter(user=user, content_type=content_type, object_id__in=ids)
+                   .values_list('object_id', flat=True).distinct())
+
 class LikedItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     # GenericType for product
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveBigIntegerField()
     content_object =  GenericForeignKey()
+
+    objects = LikedItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='likes_likeditem_target_idx'),
+        ]
+        constraints = [
+            # Also the index behind liked_by().
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='likes_likeditem_user_uniq'),
+        ]
+
+class LikeCountQuerySet(models.QuerySet):
+    def for_objects(self, model, ids):
+        """{id: like count} for the `ids` of `model` that have likes, in one query."""
+        if not ids:
+            return {}
+        content_type = ContentType.objects.db_manager(self.db).get_for_model(model)
+        return dict(self.filter(content_type=content_type, object_id__in=ids).values_list('object_id', 'count'))
+
+    def adjust(self, content_type_id, object_id, delta):
+        # An atomic increment, so concurrent likes on a hot object only queue
+        # on its counter row for the rest of their transaction.
+        target = self.filter(content_type_id=content_type_id, object_id=object_id)
+        if target.update(count=F('count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(content_type_id=content_type_id, object_id=object_id, count=delta)
+        except IntegrityError:
+            target.update(count=F('count') + delta)
+
+    def rebuild(self, batch_size=2000):
+        """Recompute every counter from LikedItem, for writes that bypassed its signals."""
+        counts = LikedItem.objects.using(self.db).order_by().values_list('content_type_id', 'object_id') \
+            .annotate(count=Count('pk'))
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create((LikeCount(content_type_id=content_type_id, object_id=object_id, count=count)
+                              for content_type_id, object_id, count in counts.iterator()), batch_size=batch_size)
+
+class LikeCount(models.Model):
+    """Likes per object, kept in step with LikedItem by likes.signals."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    objects = LikeCountQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='likes_likecount_target_uniq'),
+        ]
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import LikeCount, LikedItem
+
+
+@receiver(post_save, sender=LikedItem)
+def count_like(sender, instance, created, using='default', **kwargs):
+    if created:
+        LikeCount.objects.using(using).adjust(instance.content_type_id, instance.object_id, 1)
+
+
+@receiver(post_delete, sender=LikedItem)
+def uncount_like(sender, instance, using='default', **kwargs):
+    LikeCount.objects.using(using).adjust(instance.content_type_id, instance.object_id, -1)
@@ -1,10 +1,67 @@
+from django.conf import settings
 from django.contrib import admin
-from django.db.models import Count
+from django.core.paginator import Paginator
 from django.db.models.query import QuerySet
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.html import format_html, urlencode
 
 from . import models
+from .stats import estimate_count
+
+DEFAULTS = {
+    'LARGE_TABLES': False,
+    'COUNT_CAP': 10000,
+}
+# Search lookups that can use an index on the column.
+PREFIX_LOOKUPS = ('exact', 'iexact', 'startswith', 'istartswith')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'STORE_ADMIN', {})}
+
+
+class EstimatedCountPaginator(Paginator):
+    """A Paginator that counts with store.stats.estimate_count() instead of COUNT(*)."""
+    cap = DEFAULTS['COUNT_CAP']
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list, self.cap)
+
+
+class LargeTableAdminMixin:
+    """
+    Opt-in (STORE_ADMIN['LARGE_TABLES']) changelist mode for big tables:
+    estimated page counts and no full-table count, and prefix searches that
+    can use the column indexes instead of LIKE '%term%'.
+    """
+    @property
+    def show_full_result_count(self):
+        return not get_config()['LARGE_TABLES']
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        config = get_config()
+        if not config['LARGE_TABLES']:
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        paginator = EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page)
+        paginator.cap = config['COUNT_CAP']
+        return paginator
+
+    def get_search_fields(self, request):
+        fields = super().get_search_fields(request)
+        if not get_config()['LARGE_TABLES']:
+            return fields
+        return [
+            field if field[0] in '^=@$' or field.rsplit('__', 1)[-1] in PREFIX_LOOKUPS else '^' + field
+            for field in fields
+        ]
+
+
+class CollectionListFilter(admin.RelatedFieldListFilter):
+    """Collection choices from two columns, without building a model instance per collection."""
+    def field_choices(self, field, request, model_admin):
+        return list(models.Collection.objects.order_by('title').values_list('pk', 'title'))
 
 
 class InventoryFilter(admin.SimpleListFilter):
@@ -20,7 +77,7 @@ class InventoryFilter(admin.SimpleListFilter):
             return queryset.filter(inventory__lt=10)
 
 @admin.register(models.Product)
-class productAdmin(admin.ModelAdmin):
+class productAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     search_fields = ['title']
     autocomplete_fields = ['collection']
     prepopulated_fields = {
@@ -30,7 +87,7 @@ class productAdmin(admin.ModelAdmin):
     list_editable = ['unit_price']
     list_per_page = 10
     list_select_related = ['collection']
-    list_filter = ['collection', 'last_update', InventoryFilter]
+    list_filter = [('collection', CollectionListFilter), 'last_update', InventoryFilter]
 
     @admin.display(ordering='inventory')
     def inventory_status(self, product: models.Product):
@@ -39,14 +96,18 @@ class productAdmin(admin.ModelAdmin):
         return 'OK'
 
 @admin.register(models.Customer)
-class customerAdmin(admin.ModelAdmin):
+class customerAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     autocomplete_fields = ['user']
     list_display = ['first_name', 'last_name', 'membership']
     list_editable = ['membership']
     list_per_page = 10
     list_select_related = ['user']
     ordering = ['user__first_name', 'user__last_name']
-    search_fields = ['first_name__istartswith', 'last_name__istartswith']
+    search_fields = ['user__first_name__istartswith', 'user__last_name__istartswith']
+
+    def get_queryset(self, request):
+        # Customer.__str__ reads the user, also in the order autocomplete.
+        return super().get_queryset(request).select_related('user')
 
 class orderItemInline(admin.TabularInline):
     model = models.OrderItem
@@ -54,29 +115,24 @@ class orderItemInline(admin.TabularInline):
     extra = 0
 
 @admin.register(models.Order)
-class orderAdmin(admin.ModelAdmin):
+class orderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     inlines = [orderItemInline]
     autocomplete_fields = ['customer']  
     list_display = ['customer_name','payment_status']
     list_per_page = 10
-    list_select_related = ['customer']
+    list_select_related = ['customer__user']
 
-    @admin.display(ordering='customer')
+    @admin.display(ordering='customer__user__first_name')
     def customer_name(self, order: models.Order):
         return order.customer.user.first_name + ' ' + order.customer.user.last_name
 
 @admin.register(models.Collection)
-class collectionAdmin(admin.ModelAdmin):
+class collectionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     search_fields = ['title']
     list_display = ['title', 'products_count']
     list_per_page = 10
 
-    @admin.display(ordering='products_count')
+    @admin.display(ordering='product_count')
     def products_count(self, collection: models.Collection):
         url = reverse('admin:store_product_changelist') + '?' + urlencode({'collection__id': collection.id})
-        return format_html(f'<a href="{url}">{collection.products_count}</a>')
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            products_count = Count('products')
-        )
\ No newline at end of file
+        return format_html(f'<a href="{url}">{collection.product_count}</a>')
\ No newline at end of file
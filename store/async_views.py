@@ -0,0 +1,155 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+from django.urls import URLPattern
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .caching import ConditionalCacheMixin
+from .fieldsets import FIELDS_PARAM, OMIT_PARAM
+
+
+def async_reads_enabled():
+    return getattr(settings, 'STORE_ASYNC_READS', False)
+
+
+async def afetch(queryset):
+    # Django 4.1 cannot prefetch during async iteration, so the prefetches run
+    # separately on the ORM's sync thread.
+    lookups = queryset._prefetch_related_lookups
+    objs = [obj async for obj in queryset.prefetch_related(None)]
+    if lookups and objs:
+        await sync_to_async(prefetch_related_objects)(objs, *lookups)
+    return objs
+
+
+async def apaginate_queryset(paginator, queryset, request):
+    """PageNumberPagination.paginate_queryset() with the count and page fetched asynchronously."""
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        paginator.page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    paginator.page.object_list = await afetch(paginator.page.object_list)
+    if django_paginator.num_pages > 1 and paginator.template is not None:
+        paginator.display_page_controls = True
+    paginator.request = request
+    return list(paginator.page)
+
+
+async def afilter_queryset(view, request):
+    # Filter sets validate foreign key values against the database.
+    paginator = view.paginator
+    plain_params = {getattr(paginator, 'page_query_param', None), getattr(paginator, 'page_size_query_param', None),
+                    FIELDS_PARAM, OMIT_PARAM}
+    if set(request.query_params) - plain_params:
+        return await sync_to_async(view.filter_queryset)(view.get_queryset())
+    return view.filter_queryset(view.get_queryset())
+
+
+async def aserialize(view, instances, many=False):
+    # Serializers that batch-load per-page data (ProductSerializer.preload)
+    # do so on the ORM's sync thread before rendering.
+    serializer = view.get_serializer(instances, many=many)
+    child = serializer.child if many else serializer
+    if hasattr(child, 'preload'):
+        await sync_to_async(child.preload)([obj.pk for obj in (instances if many else [instances])])
+    return serializer.data
+
+
+async def alist(view, request, *args, **kwargs):
+    queryset = await afilter_queryset(view, request)
+    if view.paginator is not None:
+        page = await apaginate_queryset(view.paginator, queryset, request)
+        if page is not None:
+            return view.get_paginated_response(await aserialize(view, page, many=True))
+    return Response(await aserialize(view, await afetch(queryset), many=True))
+
+
+async def aretrieve(view, request, *args, **kwargs):
+    queryset = await afilter_queryset(view, request)
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        objs = await afetch(queryset.filter(**{view.lookup_field: kwargs[lookup_url_kwarg]})[:2])
+    except (TypeError, ValueError, ValidationError):
+        raise Http404
+    if len(objs) != 1:
+        raise Http404
+    view.check_object_permissions(request, objs[0])
+    return Response(await aserialize(view, objs[0]))
+
+
+def supports_list(request):
+    # Search and keyset pages keep the sync path: the in-process search index
+    # and the keyset paginator both read synchronously.
+    params = request.GET
+    return 'search' not in params and 'cursor' not in params and 'pagination' not in params
+
+
+HANDLERS = {
+    'products-list': (alist, supports_list),
+    'products-detail': (aretrieve, None),
+    'collection-list': (alist, None),
+    'carts-detail': (aretrieve, None),
+}
+
+
+async def adispatch(sync_view, handler, request, *args, **kwargs):
+    """APIView.dispatch() for a single async GET handler."""
+    view = sync_view.cls(**sync_view.initkwargs)
+    view.action_map = {**sync_view.actions, 'head': sync_view.actions['get']}
+    view.args, view.kwargs = args, kwargs
+    request = view.initialize_request(request, *args, **kwargs)
+    view.request = request
+    view.headers = view.default_response_headers
+    try:
+        # Token authentication loads the user from the database.
+        if 'HTTP_AUTHORIZATION' in request.META:
+            await sync_to_async(view.initial)(request, *args, **kwargs)
+        else:
+            view.initial(request, *args, **kwargs)
+        if isinstance(view, ConditionalCacheMixin):
+            async def render(request, *args, **kwargs):
+                return await handler(view, request, *args, **kwargs)
+            response = await view.aget_cached_response(request, render, *args, **kwargs)
+        else:
+            response = await handler(view, request, *args, **kwargs)
+    except Exception as exc:
+        response = view.handle_exception(exc)
+    view.response = view.finalize_response(request, response, *args, **kwargs)
+    return view.response
+
+
+def as_async_view(sync_view, handler, supports=None):
+    """Serve GET/HEAD natively; everything else through the sync view."""
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and (supports is None or supports(request)):
+            return await adispatch(sync_view, handler, request, *args, **kwargs)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+    view.csrf_exempt = True
+    view.cls = sync_view.cls
+    view.initkwargs = sync_view.initkwargs
+    view.actions = sync_view.actions
+    return view
+
+
+def with_async_reads(urlpatterns):
+    """Swap in the async views when STORE_ASYNC_READS is on (read when the URLconf loads)."""
+    if not async_reads_enabled():
+        return urlpatterns
+    patterns = []
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name in HANDLERS:
+            handler, supports = HANDLERS[pattern.name]
+            pattern = URLPattern(pattern.pattern, as_async_view(pattern.callback, handler, supports),
+                                 pattern.default_args, pattern.name)
+        patterns.append(pattern)
+    return patterns
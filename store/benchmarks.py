@@ -0,0 +1,42 @@
+import time
+from statistics import mean
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    return {
+        'runs': len(samples),
+        'mean_ms': round(mean(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def measure(func, repeat=20, warmup=2, setup=None):
+    """Time `func`; when `setup` is given its (untimed) result is passed to each call."""
+    samples = []
+    for run in range(warmup + repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        if run >= warmup:
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def format_table(rows, columns):
+    widths = [max(len(str(column)), *(len(str(row.get(column, ''))) for row in rows)) for column in columns]
+    lines = ['  '.join(str(column).ljust(width) for column, width in zip(columns, widths))]
+    for row in rows:
+        lines.append('  '.join(str(row.get(column, '')).ljust(width) for column, width in zip(columns, widths)))
+    return '\n'.join(lines)
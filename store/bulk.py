@@ -0,0 +1,183 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from . import models
+from .serializers import ProductImportSerializer
+
+FIELDS = ['id', 'title', 'slug', 'description', 'unit_price', 'inventory', 'collection']
+COLUMNS = ['id', 'title', 'slug', 'description', 'unit_price', 'inventory', 'collection_id']
+UPDATE_FIELDS = ['title', 'slug', 'description', 'unit_price', 'inventory', 'collection', 'last_update']
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+
+
+def read_csv(stream):
+    # Empty cells count as missing, so `id` and `description` can be left blank.
+    for row in csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig')):
+        yield {key: value for key, value in row.items() if key is not None and value != ''}
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield exc
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_chunks(chunks, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for chunk in chunks:
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def ndjson_chunks(chunks, fields):
+    for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n' for row in chunk)
+
+
+class CSVParser(BaseParser):
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_csv(stream)
+
+
+class NDJSONParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_ndjson(stream)
+
+
+class CSVRenderer(BaseRenderer):
+    """Exports are streamed by the view; this renders everything else, such as errors."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        return ''.join(csv_chunks([[[row.get(field) for field in fields] for row in rows]], fields)).encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows).encode()
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+WRITERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    The rows of a values_list() ordered by pk, in lists of `chunk_size`.
+    MySQL clients buffer whole result sets, so there every chunk is its own
+    keyset query; the other backends stream a single cursor.
+    """
+    if connections[queryset.db].vendor != 'mysql':
+        yield from batched(queryset.iterator(chunk_size=chunk_size), chunk_size)
+        return
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        chunk = list(queryset.filter(pk__gt=chunk[-1][0])[:chunk_size])
+
+
+def export_products(queryset, format, chunk_size=EXPORT_CHUNK_SIZE):
+    """The products in `queryset` as a stream of CSV or NDJSON text chunks, in id order."""
+    # Bound now: the read replica is only chosen while the view runs.
+    queryset = queryset.using(queryset.db).prefetch_related(None).values_list(*COLUMNS).order_by('pk')
+    return WRITERS[format](iter_chunks(queryset, chunk_size), FIELDS)
+
+
+def import_batch(batch, using):
+    """Writes one batch; returns the created and updated counts and the errors by row."""
+    valid, errors = [], {}
+    for number, row in batch:
+        if isinstance(row, ValueError):
+            errors[number] = {'non_field_errors': [f'Invalid JSON: {row}']}
+            continue
+        serializer = ProductImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            errors[number] = serializer.errors
+
+    collection_ids = {data['collection_id'] for _, data in valid}
+    collection_ids = set(models.Collection.objects.using(using).filter(pk__in=collection_ids)
+                         .values_list('pk', flat=True))
+    new, upserts = [], {}
+    for number, data in valid:
+        if data['collection_id'] not in collection_ids:
+            errors[number] = {'collection': [f'Invalid pk "{data["collection_id"]}" - object does not exist.']}
+        elif 'id' in data:
+            # A later row for the same id wins, as it would in a later batch.
+            upserts[data['id']] = models.Product(**data)
+        else:
+            new.append(models.Product(**data))
+
+    existing = set(models.Product.objects.using(using).filter(pk__in=upserts).values_list('pk', flat=True))
+    connection = connections[using]
+    target = {'unique_fields': ['id']} if connection.features.supports_update_conflicts_with_target else {}
+    with transaction.atomic(using=using):
+        if new:
+            models.Product.objects.using(using).bulk_create(new)
+        if upserts:
+            models.Product.objects.using(using).bulk_create(list(upserts.values()), update_conflicts=True,
+                                                            update_fields=UPDATE_FIELDS, **target)
+    return len(new) + len(upserts.keys() - existing), len(existing), errors
+
+
+def import_products(rows, batch_size=IMPORT_BATCH_SIZE, using='default'):
+    """
+    Validates and writes product rows, as produced by read_csv() or
+    read_ndjson(), one batch at a time. Rows with an `id` replace that product
+    (or create it with that id); rows without one are created. Invalid rows are
+    skipped and reported by their 1-based position.
+
+    A stream that cannot be decoded stops the import; batches already written
+    are kept.
+    """
+    result = {'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+    try:
+        for batch in batched(enumerate(rows, 1), batch_size):
+            created, updated, errors = import_batch(batch, using)
+            result['created'] += created
+            result['updated'] += updated
+            result['failed'] += len(errors)
+            for number in sorted(errors)[:MAX_REPORTED_ERRORS - len(result['errors'])]:
+                result['errors'].append({'row': number, 'errors': errors[number]})
+    except (csv.Error, UnicodeDecodeError) as exc:
+        result['error'] = f'Import stopped after writing {result["created"] + result["updated"]} rows: {exc}'
+    return result
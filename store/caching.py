@@ -0,0 +1,177 @@
+import time
+from hashlib import sha1
+from types import SimpleNamespace
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from core import routers
+
+VERSION_PREFIX = 'store:version:'
+RESPONSE_PREFIX = 'store:response:'
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    # Versions bumped by one process are invisible to the others in a
+    # per-process cache, which would then serve stale data; only a single
+    # process (tests, runserver) may opt in.
+    'ALLOW_LOCAL_MEMORY': False,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'STORE_RESPONSE_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_config()['ALIAS']]
+
+
+def is_enabled(config=None):
+    """ENABLED, unless ALIAS stores nothing or is a per-process cache that was not explicitly allowed."""
+    config = config or get_config()
+    cache = caches[config['ALIAS']]
+    if not config['ENABLED'] or isinstance(cache, DummyCache):
+        return False
+    return config['ALLOW_LOCAL_MEMORY'] or not isinstance(cache, LocMemCache)
+
+
+def new_token():
+    # The timestamp doubles as Last-Modified; the suffix keeps tokens unique.
+    return f'{time.time():.6f}:{uuid4().hex[:8]}'
+
+
+def token_time(token):
+    return float(token.split(':', 1)[0])
+
+
+def get_versions(names):
+    cache = get_cache()
+    keys = [VERSION_PREFIX + name for name in names]
+    tokens = cache.get_many(keys)
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        for key in missing:
+            cache.add(key, new_token(), None)
+        tokens.update(cache.get_many(missing))
+    return [tokens[key] for key in keys]
+
+
+def bump(names):
+    token = new_token()
+    get_cache().set_many({VERSION_PREFIX + name: token for name in names}, None)
+
+
+def invalidate(names, using='default'):
+    """
+    Give each named version a new token. Inside a transaction the bump is
+    repeated after commit, so a reader that rendered pre-commit rows cannot
+    have cached them under the new token.
+    """
+    names = list(names)
+    bump(names)
+    if connections[using].in_atomic_block:
+        transaction.on_commit(lambda: bump(names), using=using)
+
+
+class ConditionalCacheMixin:
+    """
+    ETag/Last-Modified support and a server-side cache of response data for
+    list and retrieve.
+
+    Responses are keyed by path, query parameters, `get_cache_vary()` and the
+    tokens of the versions the view depends on (`cache_versions`, and
+    `cache_detail_versions` for retrieve, formatted with the pk). Signals
+    replace those tokens when the underlying rows change, so no stale entry is
+    ever looked up again.
+    """
+    cache_versions = ()
+    cache_detail_versions = None
+
+    def get_cache_versions(self):
+        if self.action != 'retrieve' or self.cache_detail_versions is None:
+            return list(self.cache_versions)
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(lookup)
+        except ValidationError:
+            return None
+        return [name.format(pk=pk) for name in self.cache_detail_versions]
+
+    def get_cache_vary(self, request):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request, super().retrieve, *args, **kwargs)
+
+    def may_be_lagging(self, tokens):
+        # A replica may not have the rows behind a version bumped within the
+        # sticky window yet; such data must not be cached or validated.
+        if routers.get_read_alias() is None:
+            return False
+        return time.time() - max(token_time(token) for token in tokens) < routers.get_config()['STICKY_SECONDS']
+
+    def lookup_cached_response(self, request):
+        """
+        None when the response cannot be cached, otherwise the cache key and
+        validators, with `response` set to a 304 or a cache hit if available.
+        """
+        config = get_config()
+        versions = self.get_cache_versions() if is_enabled(config) else None
+        if not versions:
+            return None
+        tokens = get_versions(versions)
+        if self.may_be_lagging(tokens):
+            return None
+
+        digest = sha1(repr([
+            request.path, sorted(request.query_params.lists()), request.accepted_renderer.format,
+            self.get_cache_vary(request), tokens,
+        ]).encode()).hexdigest()
+        lookup = SimpleNamespace(
+            key=RESPONSE_PREFIX + digest, timeout=config['TIMEOUT'],
+            etag=f'W/"{digest}"', last_modified=int(max(token_time(token) for token in tokens)),
+        )
+        lookup.response = get_conditional_response(request, etag=lookup.etag, last_modified=lookup.last_modified)
+        if lookup.response is None:
+            data = get_cache().get(lookup.key)
+            if data is not None:
+                lookup.response = Response(data)
+        return lookup
+
+    def store_cached_response(self, lookup, response):
+        if response is not lookup.response:
+            if response.status_code != 200:
+                return response
+            get_cache().set(lookup.key, response.data, lookup.timeout)
+        response['ETag'] = lookup.etag
+        response['Last-Modified'] = http_date(lookup.last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_cached_response(self, request, view, *args, **kwargs):
+        lookup = self.lookup_cached_response(request)
+        if lookup is None:
+            return view(request, *args, **kwargs)
+        response = lookup.response if lookup.response is not None else view(request, *args, **kwargs)
+        return self.store_cached_response(lookup, response)
+
+    async def aget_cached_response(self, request, view, *args, **kwargs):
+        lookup = self.lookup_cached_response(request)
+        if lookup is None:
+            return await view(request, *args, **kwargs)
+        response = lookup.response if lookup.response is not None else await view(request, *args, **kwargs)
+        return self.store_cached_response(lookup, response)
@@ -0,0 +1,16 @@
+from django.core.checks import Warning, register
+
+from . import caching
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    config = caching.get_config()
+    if not config['ENABLED'] or caching.is_enabled(config):
+        return []
+    return [Warning(
+        f"STORE_RESPONSE_CACHE is enabled but its cache alias '{config['ALIAS']}' is per-process, "
+        "so the response cache is off.",
+        hint="Point ALIAS at a shared cache, or set ALLOW_LOCAL_MEMORY for a single-process server.",
+        id='store.W001',
+    )]
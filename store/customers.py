@@ -0,0 +1,47 @@
+from django.conf import settings
+
+from core.authentication import LRUCache
+
+from . import models
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CUSTOMER_ID_CACHE', {})}
+
+
+# {user id: customer id}, per process. Misses are not cached, so a profile
+# created by another process is found on the next request.
+customer_ids = LRUCache(get_config()['MAX_ENTRIES'])
+
+
+def get_customer_id(user, create=False):
+    """
+    The id of the user's customer profile, or None if there is none. With
+    `create`, a missing profile is created.
+    """
+    customer_id = customer_ids.get(user.pk)
+    if customer_id is None:
+        if create:
+            customer_id = models.Customer.objects.get_or_create(user_id=user.pk)[0].pk
+        else:
+            customer_id = models.Customer.objects.filter(user_id=user.pk).order_by() \
+                .values_list('pk', flat=True).first()
+        if customer_id is not None:
+            customer_ids.set(user.pk, customer_id, get_config()['TIMEOUT'])
+    return customer_id
+
+
+def invalidate_customer(user_id):
+    customer_ids.delete(user_id)
+
+
+class CustomerMixin:
+    """Sets `request.customer_id` for authenticated users (None for anonymous ones)."""
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        request.customer_id = get_customer_id(request.user) if request.user.is_authenticated else None
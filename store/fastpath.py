@@ -0,0 +1,185 @@
+import threading
+
+from rest_framework import serializers
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .fieldsets import fieldset_key
+from .optimizer import _get_field
+
+# Fields whose to_representation() returns database values unchanged.
+IDENTITY_FIELDS = {
+    serializers.CharField, serializers.SlugField, serializers.EmailField,
+    serializers.IntegerField, serializers.ReadOnlyField,
+}
+FLOAT = 'float'
+FIELD = 'field'
+
+
+class ReadPlan:
+    """
+    How to render a serializer straight from values_list() rows: the columns
+    to select, then for each output field the column it reads and how to
+    convert it. Converters that need the field itself are looked up on the
+    serializer being rendered, so a cached plan never holds request state.
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = list(columns)
+        self.entries = []
+
+    def index(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return self.columns.index(path)
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values_list(*self.columns)
+
+    def render(self, serializer, rows, using):
+        """The serializer's representation of `rows`, a list of values() tuples."""
+        rows = list(rows)
+        if hasattr(serializer, 'preload'):
+            serializer.preload([row[0] for row in rows])
+        getters = _getters(self.entries, serializer, rows, using)
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def _converter(field):
+    kind = type(field)
+    if kind in IDENTITY_FIELDS or (kind is PrimaryKeyRelatedField and field.pk_field is None):
+        return None
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if kind is serializers.DecimalField and not coerce_to_string and not field.localize:
+        # What JSONRenderer makes of the quantized Decimal anyway.
+        return FLOAT
+    return FIELD
+
+
+def _compile(serializer, model, plan, prefix='', nested=False):
+    """Adds the serializer's fields to `plan`; returns its entries, or None when a field needs model instances."""
+    entries = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, (serializers.SerializerMethodField, ManyRelatedField)):
+            return None
+        path, field_model = prefix, model
+        for attr in field.source_attrs[:-1]:
+            relation = _get_field(field_model, attr)
+            if relation is None or not (relation.many_to_one or relation.one_to_one):
+                return None
+            path, field_model = path + relation.name + '__', relation.related_model
+        model_field = _get_field(field_model, field.source_attrs[-1])
+        if model_field is None:
+            return None
+        if isinstance(field, serializers.ListSerializer):
+            # One level of reverse foreign keys, fetched like a prefetch.
+            if nested or path or not model_field.one_to_many or hasattr(field.child, 'preload'):
+                return None
+            if not isinstance(field.child, serializers.ModelSerializer):
+                return None
+            child_plan = ReadPlan(model_field.related_model, [model_field.field.attname])
+            child_plan.entries = _compile(field.child, model_field.related_model, child_plan, nested=True)
+            if child_plan.entries is None:
+                return None
+            entries.append(('many', name, model_field.field.name, child_plan))
+        elif isinstance(field, serializers.BaseSerializer):
+            if not (model_field.many_to_one or model_field.one_to_one) or hasattr(field, 'preload'):
+                return None
+            if not isinstance(field, serializers.ModelSerializer):
+                return None
+            related_path = path + model_field.name + '__'
+            children = _compile(field, model_field.related_model, plan, related_path, nested=True)
+            if children is None:
+                return None
+            entries.append(('one', name, plan.index(related_path + 'pk'), children))
+        elif field.source_attrs[-1] == getattr(model_field, 'attname', None) != model_field.name:
+            entries.append(('value', name, plan.index(path + model_field.attname), _converter(field)))
+        elif model_field.is_relation:
+            if not isinstance(field, PrimaryKeyRelatedField) or not model_field.concrete:
+                return None
+            entries.append(('value', name, plan.index(path + model_field.name), _converter(field)))
+        else:
+            entries.append(('value', name, plan.index(path + model_field.name), _converter(field)))
+    return entries
+
+
+def _value_getter(index, converter):
+    if converter is None:
+        return lambda row: row[index]
+    return lambda row: None if (value := row[index]) is None else converter(value)
+
+
+def _getters(entries, serializer, rows, using):
+    getters = []
+    for kind, name, *rest in entries:
+        if kind == 'value':
+            index, converter = rest
+            if converter == FLOAT:
+                converter = float
+            elif converter == FIELD:
+                converter = serializer.fields[name].to_representation
+            getters.append((name, _value_getter(index, converter)))
+        elif kind == 'one':
+            index, children = rest
+            child_getters = _getters(children, serializer.fields[name], rows, using)
+            getters.append((name, lambda row, index=index, child_getters=child_getters: None if row[index] is None
+                            else {child: get(row) for child, get in child_getters}))
+        else:
+            fk_name, child_plan = rest
+            groups = {}
+            child = serializer.fields[name].child
+            queryset = child_plan.model._default_manager.using(using).filter(**{f'{fk_name}__in': [row[0] for row in rows]})
+            child_rows = list(child_plan.values(queryset)) if rows else []
+            child_getters = _getters(child_plan.entries, child, child_rows, using)
+            for child_row in child_rows:
+                groups.setdefault(child_row[0], []).append({child: get(child_row) for child, get in child_getters})
+            getters.append((name, lambda row, groups=groups: groups.get(row[0], [])))
+    return getters
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_read_plan(serializer, key=None):
+    """The (cached per serializer class and `key`) read plan of a ModelSerializer, or None if it has none."""
+    cache_key = (type(serializer), key)
+    with _plans_lock:
+        if cache_key in _plans:
+            return _plans[cache_key]
+    plan = None
+    if isinstance(serializer, serializers.ModelSerializer):
+        model = serializer.Meta.model
+        plan = ReadPlan(model, ['pk'])
+        plan.entries = _compile(serializer, model, plan)
+        if plan.entries is None:
+            plan = None
+    with _plans_lock:
+        _plans[cache_key] = plan
+    return plan
+
+
+class FastReadMixin:
+    """
+    Lists through a ReadPlan when the serializer has one: rows come from
+    values_list() and skip model instances and DRF's per-field
+    to_representation(), with the same output. Other paginators and
+    serializers use the regular list().
+    """
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        plan = get_read_plan(serializer, fieldset_key(type(serializer), request))
+        if plan is None or not (self.paginator is None or isinstance(self.paginator, PageNumberPagination)):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = plan.values(queryset)
+        page = self.paginate_queryset(rows)
+        data = plan.render(serializer, rows if page is None else page, queryset.db)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
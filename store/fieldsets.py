@@ -0,0 +1,48 @@
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def fieldset_key(serializer_class, request):
+    """What sets a sparse fieldset's query and read plans apart from the full serializer's."""
+    return serializer_class.get_fieldset(request) if hasattr(serializer_class, 'get_fieldset') else None
+
+
+class SparseFieldsMixin:
+    """
+    Lets read requests prune a top-level serializer with `?fields=id,title`
+    (keep only these) and `?omit=tags` (drop these). Unknown names are
+    ignored; nested serializers always render in full.
+
+    QueryOptimizerMixin keys its query plans on get_fieldset(), so the
+    pruned fields are not loaded from the database either.
+    """
+    @classmethod
+    def get_fieldset(cls, request):
+        """The field names `request` selected, in Meta.fields order, or None for all of them."""
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        if FIELDS_PARAM not in params and OMIT_PARAM not in params:
+            return None
+        names = list(cls.Meta.fields)
+        if FIELDS_PARAM in params:
+            selected = parse_names(params[FIELDS_PARAM])
+            names = [name for name in names if name in selected]
+        if OMIT_PARAM in params:
+            omitted = parse_names(params[OMIT_PARAM])
+            names = [name for name in names if name not in omitted]
+        return tuple(names)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.root in (self, self.parent):
+            fieldset = self.get_fieldset(self.context.get('request'))
+            if fieldset is not None:
+                fields = {name: fields[name] for name in fieldset}
+        return fields
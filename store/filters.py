@@ -1,10 +1,38 @@
-from django_filters.rest_framework import FilterSet
+from django_filters.rest_framework import CharFilter, FilterSet, NumberFilter
+from rest_framework.filters import OrderingFilter, SearchFilter
+from tags.models import TaggedItem
 from . import models
+from .search import get_search_backend
 
 class ProductFilter(FilterSet):
+    tag = CharFilter(method='filter_tag', label='Tag (comma-separated labels match any)')
+    effective_price__gt = NumberFilter(field_name='price__effective_price', lookup_expr='gt')
+    effective_price__lt = NumberFilter(field_name='price__effective_price', lookup_expr='lt')
+
     class Meta:
         model = models.Product
         fields = {
             'collection_id': ['exact'],
             'unit_price': ['gt', 'lt'],
-        }
\ No newline at end of file
+        }
+
+    def filter_tag(self, queryset, name, value):
+        labels = [label.strip() for label in value.split(',') if label.strip()]
+        if not labels:
+            return queryset
+        return queryset.filter(pk__in=TaggedItem.objects.using(queryset.db).object_ids(models.Product, labels))
+
+class ProductSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend(queryset.db).search(queryset, ' '.join(terms))
+
+class ProductOrderingFilter(OrderingFilter):
+    """OrderingFilter that joins the effective-price table only when ordering by it."""
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view) or []
+        if any(term.lstrip('-') == 'effective_price' for term in ordering):
+            queryset = queryset.with_effective_price()
+        return super().filter_queryset(request, queryset, view)
@@ -0,0 +1,156 @@
+import json
+import random
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import routers
+from core.middleware import QueryRecorder
+from store import models
+from store.benchmarks import format_table, measure
+from store.search import get_search_backend
+from store.seeding import seed_dataset
+
+COLUMNS = ['endpoint', 'status', 'queries', 'p50_ms', 'p95_ms', 'p99_ms', 'change']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main store endpoints in-process and compare against a saved baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--customers', type=int, default=20)
+        parser.add_argument('--orders-per-customer', type=int, default=5)
+        parser.add_argument('--cart-lines', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='*', help='Run only the named endpoints.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare against results previously written with --output.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p50 slowdown reported as a regression (default 0.2).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        baseline = self.load_baseline(options['baseline'])
+        # Measure the production middleware stack, without the debug toolbar.
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+        # The seeded rows are never committed, so replicas cannot have them.
+        routing = {**routers.get_config(), 'REPLICAS': []}
+        setup_test_environment()
+        try:
+            with override_settings(MIDDLEWARE=middleware, REPLICA_ROUTING=routing), transaction.atomic():
+                data = seed_dataset(random.Random(options['seed']), options['products'],
+                                    customers=options['customers'],
+                                    orders_per_customer=options['orders_per_customer'], prefix='bench-api')
+                get_search_backend().rebuild()
+                results = self.run(data, options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        regressions = self.compare(results, baseline, options['threshold'])
+        rows = [{'endpoint': name, **stats} for name, stats in results.items()]
+        self.stdout.write(format_table(rows, COLUMNS))
+        failed = [name for name, stats in results.items() if stats['status'] >= 400]
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Error responses (timings are not comparable): {", ".join(failed)}'))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'meta': self.meta(options), 'results': results}, file, indent=2, default=str)
+        if regressions:
+            message = f'Regressions in: {", ".join(regressions)}'
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+        return client
+
+    def fill_cart(self, rng, product_ids, lines):
+        cart = models.Cart.objects.create()
+        models.CartItem.objects.bulk_create([
+            models.CartItem(cart=cart, product_id=product_id, quantity=rng.randint(1, 3))
+            for product_id in rng.sample(product_ids, lines)
+        ])
+        return cart.id
+
+    def get_endpoints(self, data, options):
+        rng = random.Random(options['seed'])
+        customer = self.client(data.users[0])
+        staff = self.client(data.staff)
+        anonymous = APIClient()
+        product_id = data.product_ids[len(data.product_ids) // 2]
+        collection_id = data.collection_ids[0]
+        cart_id = self.fill_cart(rng, data.product_ids, options['cart_lines'])
+        add_to_cart = self.fill_cart(rng, data.product_ids, 1)
+        next_product = (data.product_ids[index % len(data.product_ids)] for index in count())
+
+        return {
+            'product list': (anonymous.get, lambda: ('/store/products/',)),
+            'product list keyset': (anonymous.get, lambda: ('/store/products/?pagination=keyset&ordering=-unit_price',)),
+            'product search': (anonymous.get, lambda: ('/store/products/?search=dark roast',)),
+            'product filter': (anonymous.get, lambda: (
+                f'/store/products/?collection_id={collection_id}&unit_price__gt=100&ordering=unit_price',)),
+            'product detail': (anonymous.get, lambda: (f'/store/products/{product_id}/',)),
+            'collection list': (anonymous.get, lambda: ('/store/collection/',)),
+            'cart create': (anonymous.post, lambda: ('/store/carts/',)),
+            'cart add item': (anonymous.post, lambda: (
+                f'/store/carts/{add_to_cart}/items/', {'product_id': next(next_product), 'quantity': 1})),
+            'cart retrieve': (anonymous.get, lambda: (f'/store/carts/{cart_id}/',)),
+            'checkout': (customer.post, lambda: (
+                '/store/orders/', {'cart_id': str(self.fill_cart(rng, data.product_ids, options['cart_lines']))})),
+            'order list customer': (customer.get, lambda: ('/store/orders/',)),
+            'order list staff': (staff.get, lambda: ('/store/orders/',)),
+        }
+
+    def run(self, data, options):
+        results = {}
+        for name, (send, setup) in self.get_endpoints(data, options).items():
+            if options['only'] and name not in options['only']:
+                continue
+            recorder = QueryRecorder()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(recorder))
+                response = send(*setup())
+            stats = measure(lambda args: send(*args), repeat=options['repeat'], setup=setup)
+            stats.update(status=response.status_code, queries=recorder.count)
+            results[name] = stats
+        return results
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        with open(path) as file:
+            return json.load(file)['results']
+
+    def compare(self, results, baseline, threshold):
+        regressions = []
+        for name, stats in results.items():
+            previous = (baseline or {}).get(name)
+            if not previous:
+                continue
+            change = (stats['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] if previous['p50_ms'] else 0.0
+            stats['change'] = f'{change:+.0%}'
+            if stats['queries'] != previous['queries']:
+                stats['change'] += f' ({stats["queries"] - previous["queries"]:+d} queries)'
+            if change > threshold or stats['queries'] > previous['queries']:
+                regressions.append(name)
+        return regressions
+
+    def meta(self, options):
+        return {
+            'vendor': connection.vendor,
+            'created': datetime.now(timezone.utc).isoformat(),
+            **{key: options[key] for key in ('products', 'customers', 'orders_per_customer', 'cart_lines', 'repeat', 'seed')},
+        }
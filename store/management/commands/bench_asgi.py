@@ -0,0 +1,121 @@
+import asyncio
+import importlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import clear_url_caches
+
+from store import models
+from store.benchmarks import format_table, summarize
+from store.seeding import seed_dataset
+
+
+def reload_urlconf():
+    clear_url_caches()
+    importlib.reload(importlib.import_module('store.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+
+
+@contextmanager
+def async_reads(enabled):
+    try:
+        with override_settings(STORE_ASYNC_READS=enabled):
+            reload_urlconf()
+            yield
+    finally:
+        reload_urlconf()
+
+
+class Command(BaseCommand):
+    help = ('Compare concurrent read throughput of the async views under the in-process ASGI handler '
+            'with the sync views under the WSGI handler.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Concurrent WSGI workers use their own connections, so the data is
+        # committed and removed afterwards instead of rolled back.
+        data = seed_dataset(random.Random(options['seed']), options['products'], customers=1,
+                            orders_per_customer=0, prefix='bench-asgi')
+        cart = models.Cart.objects.create()
+        models.CartItem.objects.bulk_create([
+            models.CartItem(cart=cart, product_id=product_id, quantity=1) for product_id in data.product_ids[:10]
+        ])
+        urls = [
+            '/store/products/',
+            f'/store/products/{data.product_ids[0]}/',
+            '/store/collection/',
+            f'/store/carts/{cart.id}/',
+        ]
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+        rows = []
+        setup_test_environment()
+        try:
+            with override_settings(MIDDLEWARE=middleware, STORE_RESPONSE_CACHE={'ENABLED': False}):
+                for concurrency in options['concurrency']:
+                    with async_reads(False):
+                        rows.append(self.run_wsgi(urls, concurrency, options['requests']))
+                    with async_reads(True):
+                        rows.append(self.run_asgi(urls, concurrency, options['requests']))
+        finally:
+            teardown_test_environment()
+            self.cleanup(data, cart)
+        self.stdout.write(format_table(rows, ['handler', 'concurrency', 'requests', 'errors', 'req_per_s',
+                                              'p50_ms', 'p95_ms', 'p99_ms']))
+
+    def run_wsgi(self, urls, concurrency, requests):
+        def worker(index):
+            client, samples, errors = Client(), [], 0
+            for number in range(index, requests, concurrency):
+                start = time.perf_counter()
+                errors += client.get(urls[number % len(urls)]).status_code != 200
+                samples.append(time.perf_counter() - start)
+            connections.close_all()
+            return samples, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(worker, range(concurrency)))
+        return self.row('wsgi', concurrency, results, time.perf_counter() - start)
+
+    def run_asgi(self, urls, concurrency, requests):
+        async def worker(index):
+            client, samples, errors = AsyncClient(), [], 0
+            for number in range(index, requests, concurrency):
+                start = time.perf_counter()
+                errors += (await client.get(urls[number % len(urls)])).status_code != 200
+                samples.append(time.perf_counter() - start)
+            return samples, errors
+
+        async def main():
+            return await asyncio.gather(*(worker(index) for index in range(concurrency)))
+
+        start = time.perf_counter()
+        results = async_to_sync(main)()
+        return self.row('asgi', concurrency, results, time.perf_counter() - start)
+
+    def row(self, handler, concurrency, results, elapsed):
+        samples = [sample for worker_samples, _ in results for sample in worker_samples]
+        stats = summarize(samples)
+        stats.update(handler=handler, concurrency=concurrency, requests=len(samples),
+                     errors=sum(errors for _, errors in results), req_per_s=round(len(samples) / elapsed, 1))
+        return stats
+
+    def cleanup(self, data, cart):
+        cart.delete()
+        get_user_model().objects.filter(pk__in=[user.pk for user in data.users + [data.staff]]).delete()
+        models.Product.objects.filter(id__in=data.product_ids).delete()
+        models.Collection.objects.filter(id__in=data.collection_ids).delete()
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from store import models, serializers
+from store.benchmarks import format_table, measure
+
+
+class Command(BaseCommand):
+    help = 'Compare cart retrieval with Python-side totals against SQL-annotated totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='*', default=[10, 100, 500])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = []
+        with transaction.atomic():
+            collection = models.Collection.objects.create(title='bench_cart')
+            products = models.Product.objects.bulk_create([
+                models.Product(title=f'Bench product {index}', slug=f'bench-{index}', description='x' * 2000,
+                               unit_price=index % 900 + 1, inventory=1000, collection=collection)
+                for index in range(max(options['lines']))
+            ])
+            for lines in options['lines']:
+                cart = models.Cart.objects.create()
+                models.CartItem.objects.bulk_create([
+                    models.CartItem(cart=cart, product=product, quantity=index % 5 + 1)
+                    for index, product in enumerate(products[:lines])
+                ])
+                paths = {
+                    'python totals': models.Cart.objects.prefetch_related('items__product'),
+                    'sql totals': models.Cart.objects.with_totals(),
+                }
+                for name, queryset in paths.items():
+                    def retrieve():
+                        return serializers.CartSerializer(queryset.get(pk=cart.pk)).data
+                    with CaptureQueriesContext(connection) as queries:
+                        retrieve()
+                    stats = measure(retrieve, repeat=options['repeat'])
+                    stats.update(lines=lines, path=name, queries=len(queries))
+                    rows.append(stats)
+            transaction.set_rollback(True)
+        self.stdout.write(format_table(rows, ['lines', 'path', 'queries', 'p50_ms', 'p95_ms', 'p99_ms']))
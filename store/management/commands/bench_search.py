@@ -0,0 +1,66 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store import models
+from store.benchmarks import format_table, measure
+from store.filters import ProductSearchFilter
+from store.search import get_search_backend
+from store.seeding import WORDS
+from store.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare the product search backend against the LIKE-based SearchFilter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', default=['coffee', 'dark roast', 'chee', 'wild honey'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed-products', type=int, default=0,
+                            help='Create this many synthetic products for the run and delete them afterwards.')
+
+    def handle(self, *args, **options):
+        seeded = self.seed(options['seed_products']) if options['seed_products'] else None
+        try:
+            backend = type(get_search_backend()).__name__
+            self.stdout.write(f'{connection.vendor} / {backend} / {models.Product.objects.count()} products')
+            rows = [row for term in options['terms'] for row in self.bench(term, options['repeat'])]
+        finally:
+            if seeded:
+                models.Product.objects.filter(collection=seeded).delete()
+                seeded.delete()
+        self.stdout.write(format_table(rows, ['term', 'filter', 'matches', 'p50_ms', 'p95_ms', 'p99_ms']))
+
+    def seed(self, count):
+        rng = random.Random(0)
+        collection = models.Collection.objects.create(title='bench_search')
+        products = [
+            models.Product(
+                title=' '.join(rng.choices(WORDS, k=3)),
+                slug=f'bench-search-{index}',
+                description=' '.join(rng.choices(WORDS, k=40)),
+                unit_price=rng.randint(1, 999),
+                inventory=rng.randint(0, 500),
+                collection=collection,
+            ) for index in range(count)
+        ]
+        models.Product.objects.bulk_create(products, batch_size=1000)
+        get_search_backend().rebuild()
+        return collection
+
+    def bench(self, term, repeat):
+        view = ProductViewSet()
+        request = Request(APIRequestFactory().get('/store/products/', {'search': term}))
+        results = []
+        for search_filter in (SearchFilter(), ProductSearchFilter()):
+            def run():
+                queryset = search_filter.filter_queryset(request, models.Product.objects.all(), view)
+                return queryset.count(), list(queryset[:10])
+            stats = measure(run, repeat=repeat)
+            stats.update(term=term, filter=type(search_filter).__name__, matches=run()[0])
+            results.append(stats)
+        return results
@@ -0,0 +1,64 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store import models, serializers
+from store.benchmarks import format_table, measure
+from store.fastpath import get_read_plan
+from store.optimizer import optimize_queryset
+from store.pricing import refresh_prices
+from store.renderers import FastJSONRenderer
+from store.seeding import seed_dataset
+
+COLUMNS = ['serializer', 'path', 'rows', 'p50_ms', 'p95_ms', 'rows_per_s', 'identical']
+
+
+class Command(BaseCommand):
+    help = ('Compare rows per second of DRF serialization plus JSONRenderer with the values() read path '
+            'plus FastJSONRenderer, and check that both produce the same bytes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            seed_dataset(random.Random(options['seed']), rows, customers=max(1, rows // 20),
+                         orders_per_customer=5, prefix='bench-serializers')
+            refresh_prices()
+            context = {'request': Request(APIRequestFactory().get('/store/products/'))}
+            cases = [
+                (serializers.ProductSerializer, models.Product.objects.all()),
+                (serializers.SimpleProductSerializer, models.Product.objects.all()),
+                (serializers.OrderItemSerializer, models.OrderItem.objects.order_by('pk')),
+            ]
+            results = [row for serializer_class, queryset in cases
+                       for row in self.bench(serializer_class, queryset, context, rows, options['repeat'])]
+            transaction.set_rollback(True)
+        self.stdout.write(format_table(results, COLUMNS))
+
+    def bench(self, serializer_class, queryset, context, rows, repeat):
+        def drf():
+            serializer = serializer_class(context=context)
+            instances = list(optimize_queryset(queryset, serializer)[:rows])
+            return JSONRenderer().render(serializer_class(instances, many=True, context=context).data)
+
+        def fast():
+            serializer = serializer_class(context=context)
+            plan = get_read_plan(serializer)
+            return FastJSONRenderer().render(plan.render(serializer, plan.values(queryset)[:rows], queryset.db))
+
+        identical = drf() == fast()
+        results = []
+        for path, func in (('drf', drf), ('fast', fast)):
+            stats = measure(func, repeat=repeat)
+            stats.update(serializer=serializer_class.__name__, path=path, rows=rows, identical=identical,
+                         rows_per_s=round(rows / stats['p50_ms'] * 1000) if stats['p50_ms'] else 0)
+            results.append(stats)
+        return results
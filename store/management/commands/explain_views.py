@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store import urls
+
+PLACEHOLDER_KWARGS = {'pk': uuid4(), 'product_pk': 1, 'cart_pk': uuid4()}
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN each store ViewSet's list queryset and report full table scans and sorts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error when any plan contains a full table scan.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        registry = urls.router.registry + urls.products_router.registry + urls.cart_router.registry
+        full_scans = []
+        for prefix, viewset, basename in registry:
+            for label, queryset in self.get_querysets(viewset, prefix):
+                queryset = queryset.using(options['database'])
+                scans, sorts, plan = self.explain(connection, queryset)
+                status = self.style.ERROR('FULL SCAN') if scans else self.style.SUCCESS('ok')
+                self.stdout.write(f'{label}: {status}' + (' (sort)' if sorts else ''))
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                if scans:
+                    full_scans.append(label)
+        if full_scans and options['fail_on_scan']:
+            raise CommandError(f'Full table scans in: {", ".join(full_scans)}')
+
+    def get_queryset(self, viewset, prefix, params=None):
+        view = viewset(action='list', kwargs=PLACEHOLDER_KWARGS, format_kwarg=None)
+        view.request = Request(APIRequestFactory().get(f'/store/{prefix}/', params))
+        view.request.user = SimpleNamespace(id=0, is_staff=True, is_authenticated=True)
+        return view, view.filter_queryset(view.get_queryset())
+
+    def get_querysets(self, viewset, prefix):
+        view, queryset = self.get_queryset(viewset, prefix)
+        if not hasattr(viewset, 'list'):
+            yield f'{viewset.__name__} retrieve', queryset.filter(pk=PLACEHOLDER_KWARGS['pk'])
+            return
+        page_size = getattr(view.pagination_class, 'page_size', None) or 10
+        yield viewset.__name__, queryset[:page_size]
+        for field in getattr(viewset, 'ordering_fields', None) or []:
+            # Through the view's ordering filter, which adds any annotation the field needs.
+            _, ordered = self.get_queryset(viewset, prefix, {'ordering': field})
+            yield f'{viewset.__name__} ordering={field}', ordered.order_by(*ordered.query.order_by, 'id')[:page_size]
+
+    def explain(self, connection, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+                scans = [line for line in plan if line.startswith('SCAN') and 'USING' not in line]
+                sorts = [line for line in plan if 'TEMP B-TREE' in line]
+            elif connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql, params)
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                plan = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}" for row in rows]
+                scans = [row for row in rows if row['type'] == 'ALL']
+                sorts = [row for row in rows if 'filesort' in (row['Extra'] or '')]
+            else:
+                plan = queryset.explain().splitlines()
+                scans = [line for line in plan if 'Seq Scan' in line]
+                sorts = [line for line in plan if 'Sort' in line]
+        return scans, sorts, plan
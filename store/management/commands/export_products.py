@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from store import bulk, models
+
+
+class Command(BaseCommand):
+    help = 'Write every product as CSV or NDJSON, streaming in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(bulk.WRITERS), default='csv')
+        parser.add_argument('--output', help='Defaults to standard output.')
+        parser.add_argument('--chunk-size', type=int, default=bulk.EXPORT_CHUNK_SIZE)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        queryset = models.Product.objects.using(options['database'])
+        chunks = bulk.export_products(queryset, options['format'], options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(chunks)
@@ -0,0 +1,37 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import bulk
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or NDJSON file, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input.')
+        parser.add_argument('--format', choices=sorted(bulk.READERS),
+                            help='Defaults to the file extension, or csv for standard input.')
+        parser.add_argument('--batch-size', type=int, default=bulk.IMPORT_BATCH_SIZE)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('csv' if path == '-' else path.rsplit('.', 1)[-1].lower())
+        if format not in bulk.READERS:
+            raise CommandError(f'Unknown format "{format}"; pass --format.')
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            result = bulk.import_products(bulk.READERS[format](stream), options['batch_size'], options['database'])
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        if result['failed'] > len(result['errors']):
+            self.stderr.write(f"... and {result['failed'] - len(result['errors'])} more invalid rows.")
+        summary = f"Created {result['created']}, updated {result['updated']}, skipped {result['failed']} products."
+        if 'error' in result:
+            raise CommandError(f"{result['error']}\n{summary}")
+        self.stdout.write(self.style.SUCCESS(summary))
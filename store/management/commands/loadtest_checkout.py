@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+
+from store import models, serializers
+
+
+class Command(BaseCommand):
+    help = (
+        'Run parallel checkouts against a few hot products, then verify that no '
+        'inventory was oversold or lost. Needs a database with row locking (MySQL); '
+        'SQLite serializes writers and reports lock errors instead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--inventory', type=int, default=300)
+        parser.add_argument('--quantity', type=int, default=2, help='Quantity of each hot product per cart.')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows.')
+
+    def handle(self, *args, **options):
+        run = uuid4().hex[:8]
+        user = get_user_model().objects.create_user(username=f'loadtest-{run}', email=f'loadtest-{run}@example.com')
+        collection = models.Collection.objects.create(title=f'loadtest {run}')
+        products = models.Product.objects.bulk_create([
+            models.Product(title=f'Hot product {index}', slug=f'hot-{index}', unit_price=10,
+                           inventory=options['inventory'], collection=collection)
+            for index in range(options['products'])
+        ])
+        product_ids = [product.pk for product in products]
+        carts = models.Cart.objects.bulk_create([models.Cart() for _ in range(options['orders'])])
+        models.CartItem.objects.bulk_create([
+            models.CartItem(cart=cart, product_id=pk, quantity=options['quantity'])
+            for cart in carts for pk in product_ids
+        ])
+
+        def checkout(cart):
+            try:
+                serializer = serializers.CreateOrderSerializer(data={'cart_id': cart.pk}, context={'user': user})
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return 'ordered'
+            except serializers.OutOfStock:
+                return 'out_of_stock'
+            except DatabaseError:
+                return 'db_error'
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            outcomes = list(executor.map(checkout, carts))
+        elapsed = time.perf_counter() - start
+
+        ordered = outcomes.count('ordered')
+        sold = models.OrderItem.objects.filter(product_id__in=product_ids) \
+            .values('product_id').annotate(quantity=Sum('quantity'))
+        sold = {row['product_id']: row['quantity'] for row in sold}
+        remaining = dict(models.Product.objects.filter(pk__in=product_ids).values_list('pk', 'inventory'))
+        errors = [
+            pk for pk in product_ids
+            if remaining[pk] < 0 or remaining[pk] + sold.get(pk, 0) != options['inventory']
+            or sold.get(pk, 0) != ordered * options['quantity']
+        ]
+        expected = min(options['orders'], options['inventory'] // options['quantity'])
+
+        self.stdout.write(f'{connection.vendor}: {options["orders"]} checkouts, {options["workers"]} workers')
+        self.stdout.write(f'ordered={ordered} out_of_stock={outcomes.count("out_of_stock")} '
+                          f'db_errors={outcomes.count("db_error")} expected_orders={expected}')
+        self.stdout.write(f'{elapsed:.2f}s, {ordered / elapsed:.1f} orders/s')
+
+        if not options['keep']:
+            orders = models.Order.objects.filter(customer__user=user)
+            models.OrderItem.objects.filter(order__in=orders).delete()
+            orders.delete()
+            models.Cart.objects.filter(pk__in=[cart.pk for cart in carts]).delete()
+            models.Product.objects.filter(pk__in=product_ids).delete()
+            collection.delete()
+            user.delete()
+
+        if errors:
+            raise CommandError(f'Inventory mismatch for products {errors}')
+        self.stdout.write(self.style.SUCCESS('Inventory consistent.'))
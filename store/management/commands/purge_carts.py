@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from store.tasks import purge_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned carts (and their items) older than the CART_PURGE TTL, in throttled chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-days', type=float, help='Defaults to CART_PURGE["TTL_DAYS"].')
+        parser.add_argument('--chunk-size', type=int, help='Defaults to CART_PURGE["CHUNK_SIZE"].')
+        parser.add_argument('--pause', type=float, help='Seconds between chunks; defaults to CART_PURGE["PAUSE"].')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        result = purge_abandoned_carts(options['ttl_days'], options['chunk_size'], options['pause'],
+                                       options['database'])
+        rows = result['carts'] + result['items']
+        rate = rows / result['seconds'] if result['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['carts']} carts and {result['items']} items in {result['seconds']:.2f}s "
+            f"({rate:.0f} rows/s)."
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store import caching, models
+
+
+class Command(BaseCommand):
+    help = 'Recompute Collection.product_count from the product table in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        collections = models.Collection.objects.using(using)
+        last_id = 0
+        total = 0
+        start = time.perf_counter()
+        while True:
+            ids = list(collections.filter(pk__gt=last_id).order_by('pk')
+                       .values_list('pk', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            with transaction.atomic(using=using):
+                total += collections.filter(pk__in=ids).recount_products()
+            last_id = ids[-1]
+        caching.invalidate(['collections'], using)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Recounted {total} collections in {elapsed:.2f}s.'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import caching
+from store.pricing import BATCH_SIZE, refresh_prices
+
+
+class Command(BaseCommand):
+    help = 'Recompute the effective-price table, after writes that bypassed its signals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = refresh_prices(using=options['database'], batch_size=options['batch_size'])
+        caching.invalidate(['products', 'products:bulk'], options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Priced {total} products in {time.perf_counter() - start:.2f}s.'))
@@ -0,0 +1,310 @@
+import multiprocessing
+import random
+import time
+from bisect import bisect_right
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+from likes.models import LikeCount, LikedItem
+from store import caching, models
+from store.benchmarks import format_table
+from store.pricing import refresh_prices
+from store.search import get_search_backend
+from store.signals import bulk_changes_deferred
+from store.seeding import fixed_price, skewed, words
+from tags.models import Tag, TaggedItem
+
+
+def build_users(plan, rng, start, stop):
+    first = plan['offsets']['users']
+    return [
+        get_user_model()(id=first + index, username=f"{plan['prefix']}-{first + index}",
+                         email=f"{plan['prefix']}-{first + index}@example.com", password=plan['password'],
+                         first_name=words(rng, 1).capitalize(), last_name=words(rng, 1).capitalize())
+        for index in range(start, stop)
+    ]
+
+
+def build_customers(plan, rng, start, stop):
+    first, users = plan['offsets']['customers'], plan['offsets']['users']
+    return [
+        models.Customer(id=first + index, user_id=users + index, phone=str(rng.randint(10 ** 9, 10 ** 10 - 1)),
+                        membership=rng.choices('BSG', weights=[80, 15, 5])[0])
+        for index in range(start, stop)
+    ]
+
+
+def build_collections(plan, rng, start, stop):
+    first = plan['offsets']['collections']
+    return [models.Collection(id=first + index, title=words(rng, 2).title()) for index in range(start, stop)]
+
+
+def build_products(plan, rng, start, stop):
+    first, collections = plan['offsets']['products'], plan['offsets']['collections']
+    return [
+        models.Product(id=first + index, title=words(rng, 3).capitalize(), slug=f"{plan['prefix']}-{first + index}",
+                       description=words(rng, 40), unit_price=fixed_price(first + index),
+                       inventory=rng.randint(0, 1000),
+                       collection_id=collections + skewed(rng, plan['counts']['collections'], plan['product_skew']))
+        for index in range(start, stop)
+    ]
+
+
+def build_orders(plan, rng, start, stop):
+    first, customers = plan['offsets']['orders'], plan['offsets']['customers']
+    return [
+        models.Order(id=first + index, payment_status=rng.choices('CPF', weights=[85, 10, 5])[0],
+                     customer_id=customers + skewed(rng, plan['counts']['customers'], plan['customer_skew']))
+        for index in range(start, stop)
+    ]
+
+
+def build_orderitems(plan, rng, start, stop):
+    first, orders, products = plan['offsets']['orderitems'], plan['offsets']['orders'], plan['offsets']['products']
+    items = []
+    for index in range(start, stop):
+        product_id = products + skewed(rng, plan['counts']['products'], plan['product_skew'])
+        items.append(models.OrderItem(id=first + index, order_id=orders + index // plan['items_per_order'],
+                                      product_id=product_id, unit_price=fixed_price(product_id),
+                                      quantity=rng.randint(1, 5)))
+    return items
+
+
+def build_reviews(plan, rng, start, stop):
+    first, products = plan['offsets']['reviews'], plan['offsets']['products']
+    return [
+        models.Review(id=first + index, name=words(rng, 2).title(), description=words(rng, 30),
+                      product_id=products + skewed(rng, plan['counts']['products'], plan['product_skew']))
+        for index in range(start, stop)
+    ]
+
+
+def build_tags(plan, rng, start, stop):
+    first = plan['offsets']['tags']
+    return [Tag(id=first + index, label=f'{words(rng, 1)}-{first + index}') for index in range(start, stop)]
+
+
+def build_taggeditems(plan, rng, start, stop):
+    first, tags, products = plan['offsets']['taggeditems'], plan['offsets']['tags'], plan['offsets']['products']
+    return [
+        TaggedItem(id=first + index, tag_id=tags + tag, content_type_id=plan['product_type'], object_id=products + product)
+        for index, (product, tag) in zip(range(start, stop), pair_rows(plan, 'taggeditems', start, stop))
+    ]
+
+
+def build_likeditems(plan, rng, start, stop):
+    first, users, products = plan['offsets']['likeditems'], plan['offsets']['users'], plan['offsets']['products']
+    return [
+        LikedItem(id=first + index, content_type_id=plan['product_type'], user_id=users + user,
+                  object_id=products + product)
+        for index, (product, user) in zip(range(start, stop), pair_rows(plan, 'likeditems', start, stop))
+    ]
+
+
+# Tables of distinct (product, choice) pairs: the table the choices come
+# from and the skew they are drawn with.
+PAIRS = {
+    'taggeditems': ('tags', 'product_skew'),
+    'likeditems': ('users', 'customer_skew'),
+}
+
+
+def plan_pairs(plan, table):
+    """
+    How many rows each product gets in a pair table, as parallel lists of
+    product indexes, their first rows and their row counts. A product never
+    gets more rows than there are choices.
+    """
+    rng = random.Random(f"{plan['seed']}:{table}")
+    choices = plan['counts'][PAIRS[table][0]]
+    picks = Counter(skewed(rng, plan['counts']['products'], plan['product_skew']) for _ in range(plan['counts'][table]))
+    layout = {'products': [], 'firsts': [], 'counts': []}
+    row = 0
+    for product in sorted(picks):
+        count = min(picks[product], choices)
+        layout['products'].append(product)
+        layout['firsts'].append(row)
+        layout['counts'].append(count)
+        row += count
+    return layout
+
+
+def distinct_picks(rng, count, skew, k):
+    """`k` distinct skewed indexes in range(count); a repeated pick moves on to the next free index."""
+    picked, seen = [], set()
+    for _ in range(k):
+        index = skewed(rng, count, skew)
+        while index in seen:
+            index = (index + 1) % count
+        seen.add(index)
+        picked.append(index)
+    return picked
+
+
+def pair_rows(plan, table, start, stop):
+    """(product, choice) index pairs for rows start..stop of a pair table; no pair repeats across the table."""
+    choices, skew = PAIRS[table]
+    layout = plan['pairs'][table]
+    rows = []
+    for position in range(max(bisect_right(layout['firsts'], start) - 1, 0), len(layout['firsts'])):
+        first, count = layout['firsts'][position], layout['counts'][position]
+        if first >= stop:
+            break
+        # Seeded by product, so a product split across chunks draws the same choices in each.
+        product = layout['products'][position]
+        rng = random.Random(f"{plan['seed']}:{table}:{product}")
+        picks = distinct_picks(rng, plan['counts'][choices], plan[skew], count)
+        rows.extend((product, pick) for pick in picks[max(start - first, 0):stop - first])
+    return rows
+
+
+# Insertion order: every table only references tables above it.
+TABLES = [
+    ('users', get_user_model(), build_users),
+    ('customers', models.Customer, build_customers),
+    ('collections', models.Collection, build_collections),
+    ('products', models.Product, build_products),
+    ('orders', models.Order, build_orders),
+    ('orderitems', models.OrderItem, build_orderitems),
+    ('reviews', models.Review, build_reviews),
+    ('tags', Tag, build_tags),
+    ('taggeditems', TaggedItem, build_taggeditems),
+    ('likeditems', LikedItem, build_likeditems),
+]
+BUILDERS = {name: (model, builder) for name, model, builder in TABLES}
+
+
+def insert_chunk(task):
+    # Each chunk has its own RNG, so the data does not depend on the number of workers.
+    plan, table, start, stop = task
+    model, builder = BUILDERS[table]
+    rng = random.Random(f"{plan['seed']}:{table}:{start}")
+    objs = builder(plan, rng, start, stop)
+    with transaction.atomic(using=plan['database']):
+        model.objects.using(plan['database']).bulk_create(objs, batch_size=plan['batch_size'])
+    return stop - start
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, referentially consistent synthetic store for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--collections', type=int, default=100)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--reviews', type=int, default=50000)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--tagged-items', type=int, default=200000)
+        parser.add_argument('--likes', type=int, default=200000)
+        parser.add_argument('--product-skew', type=float, default=2.0,
+                            help='Above 1, concentrates orders, reviews, tags and likes on a few hot products.')
+        parser.add_argument('--customer-skew', type=float, default=2.0,
+                            help='Above 1, concentrates orders and likes on a few heavy customers.')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='Leave the new products out of the search index, e.g. to rebuild it separately.')
+
+    def handle(self, *args, **options):
+        database = options['database']
+        counts = {
+            'users': options['customers'],
+            'customers': options['customers'],
+            'collections': options['collections'],
+            'products': options['products'],
+            'orders': options['orders'],
+            'orderitems': options['orders'] * options['items_per_order'],
+            'reviews': options['reviews'],
+            'tags': options['tags'],
+            'taggeditems': options['tagged_items'],
+            'likeditems': options['likes'],
+        }
+        for parent, children in (('customers', ['orders', 'likeditems']), ('products', ['orderitems', 'reviews', 'taggeditems', 'likeditems']),
+                                 ('collections', ['products']), ('tags', ['taggeditems'])):
+            if not counts[parent] and any(counts[child] for child in children):
+                raise CommandError(f'--{parent} must be positive to generate {", ".join(children)}.')
+
+        workers = options['workers']
+        if workers > 1 and connections[database].vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite serializes writers; using a single worker.'))
+            workers = 1
+
+        plan = {
+            'seed': options['seed'],
+            'prefix': options['prefix'],
+            'database': database,
+            'batch_size': options['batch_size'],
+            'items_per_order': options['items_per_order'],
+            'product_skew': options['product_skew'],
+            'customer_skew': options['customer_skew'],
+            'counts': counts,
+            'password': make_password(None),
+            'product_type': ContentType.objects.db_manager(database).get_for_model(models.Product).id,
+            'offsets': {
+                name: (model.objects.using(database).aggregate(last=Max('id'))['last'] or 0) + 1
+                for name, model, _ in TABLES
+            },
+        }
+        # Repeated tags and likes would be data the app cannot produce, so
+        # these tables get at most one row per pair and may come out smaller.
+        plan['pairs'] = {table: plan_pairs(plan, table) for table in PAIRS}
+        for table, layout in plan['pairs'].items():
+            counts[table] = sum(layout['counts'])
+
+        rows = []
+        started = time.perf_counter()
+        # Product chunks would otherwise be indexed, repriced and invalidated
+        # one by one; that is done once below. Forked workers inherit this.
+        with bulk_changes_deferred():
+            for name, model, _ in TABLES:
+                tasks = [
+                    (plan, name, start, min(start + options['chunk_size'], counts[name]))
+                    for start in range(0, counts[name], options['chunk_size'])
+                ]
+                table_started = time.perf_counter()
+                inserted = self.run(tasks, workers)
+                elapsed = time.perf_counter() - table_started
+                rows.append({'table': name, 'rows': inserted, 'seconds': round(elapsed, 2),
+                             'rows_per_s': round(inserted / elapsed) if elapsed else 0})
+
+        self.reset_sequences(database)
+        # Bulk inserts bypass the signals that maintain the like counters.
+        LikeCount.objects.using(database).rebuild()
+        first_product = plan['offsets']['products']
+        refresh_prices(range(first_product, first_product + counts['products']), database)
+        caching.invalidate(['products', 'products:bulk', 'collections'], database)
+        if not options['skip_search_index']:
+            get_search_backend(database).rebuild()
+        elapsed = time.perf_counter() - started
+        total = sum(row['rows'] for row in rows)
+        rows.append({'table': 'total', 'rows': total, 'seconds': round(elapsed, 2), 'rows_per_s': round(total / elapsed)})
+        self.stdout.write(format_table(rows, ['table', 'rows', 'seconds', 'rows_per_s']))
+
+    def run(self, tasks, workers):
+        if workers <= 1 or len(tasks) <= 1:
+            return sum(insert_chunk(task) for task in tasks)
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return sum(pool.imap_unordered(insert_chunk, tasks))
+
+    def reset_sequences(self, database):
+        connection = connections[database]
+        statements = connection.ops.sequence_reset_sql(no_style(), [model for _, model, _ in TABLES])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
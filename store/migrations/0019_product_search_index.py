@@ -0,0 +1,37 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'store_product_search'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE store_product ADD FULLTEXT INDEX {SEARCH_TABLE} (title, description)')
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+            "USING fts5(title, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, description) '
+            "SELECT id, title, COALESCE(description, '') FROM store_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE store_product DROP INDEX {SEARCH_TABLE}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_alter_orderitem_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
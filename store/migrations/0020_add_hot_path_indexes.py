@@ -0,0 +1,45 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['created_at'], name='store_cart_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'placed_at'], name='store_order_cust_placed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['placed_at'], name='store_order_placed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['title'], name='store_product_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['collection', 'unit_price'], name='store_product_coll_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['unit_price', 'id'], name='store_product_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['last_update', 'id'], name='store_product_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'date'], name='store_review_product_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_products(apps, schema_editor):
+    Collection = apps.get_model('store', 'Collection')
+    Product = apps.get_model('store', 'Product')
+    counts = Product.objects.filter(collection_id=OuterRef('pk')).order_by() \
+        .values('collection_id').annotate(count=Count('pk')).values('count')
+    Collection.objects.update(product_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_add_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:50
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+
+
+def price_products(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductPrice = apps.get_model('store', 'ProductPrice')
+    discounts = dict(Product.promotion.through.objects.order_by().values_list('product_id')
+                     .annotate(Max('promotion__discount')))
+    ProductPrice.objects.bulk_create((
+        ProductPrice(product_id=pk, effective_price=(
+            price * (1 - min(max(Decimal(str(discounts.get(pk, 0))), 0), 1))
+        ).quantize(Decimal('0.01'), ROUND_HALF_UP))
+        for pk, price in Product.objects.values_list('pk', 'unit_price').iterator()
+    ), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_collection_product_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price', serialize=False, to='store.product')),
+                ('effective_price', models.DecimalField(decimal_places=2, max_digits=6)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productprice',
+            index=models.Index(fields=['effective_price', 'product'], name='store_productprice_price_idx'),
+        ),
+        migrations.RunPython(price_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_productprice'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['title'], name='store_collection_title_idx'),
+        ),
+    ]
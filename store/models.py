@@ -1,17 +1,40 @@
+from collections import Counter
 from django.conf import settings
 from django.contrib import admin
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
+from django.dispatch import Signal
 from uuid import uuid4
 
+# Sent by ProductQuerySet writes that bypass post_save, with `ids` (None when
+# an update() matches too many rows to list), `fields` (None for whole rows)
+# and `using`.
+products_bulk_changed = Signal()
+
 # Create your models here.
 class Promotion(models.Model):
     description: models.CharField(max_length=255)
     discount = models.FloatField()
     
+class CollectionQuerySet(models.QuerySet):
+    def adjust_product_counts(self, deltas):
+        # Sorted so concurrent writers lock collection rows in the same order.
+        for collection_id in sorted(pk for pk, delta in deltas.items() if delta and pk is not None):
+            self.filter(pk=collection_id).update(product_count=F('product_count') + deltas[collection_id])
+
+    def recount_products(self):
+        counts = Product.objects.filter(collection_id=OuterRef('pk')).order_by() \
+            .values('collection_id').annotate(count=Count('pk')).values('count')
+        return self.update(product_count=Coalesce(Subquery(counts), 0))
+
 class Collection(models.Model):
     title = models.CharField(max_length=100)
     featured_product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, related_name='+')
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CollectionQuerySet.as_manager()
 
     #setting:
     def __str__(self) -> str:
@@ -19,7 +42,98 @@ class Collection(models.Model):
     
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title'], name='store_collection_title_idx'),
+        ]
         
+class ProductQuerySet(models.QuerySet):
+    """
+    Bulk operations that keep `Collection.product_count` in step, since they
+    bypass `Product.save()` and `Product.delete()`.
+    """
+    changed_ids_limit = 1000
+
+    def with_effective_price(self):
+        return self.annotate(effective_price=F('price__effective_price'))
+
+    def _counts_by_collection(self):
+        return Counter(dict(self.order_by().values_list('collection_id').annotate(Count('pk'))))
+
+    def _changed_ids(self):
+        ids = list(self.order_by().values_list('pk', flat=True)[:self.changed_ids_limit + 1])
+        return ids if len(ids) <= self.changed_ids_limit else None
+
+    def _send_changed(self, ids, fields):
+        products_bulk_changed.send(sender=self.model, ids=ids, fields=fields, using=self.db)
+
+    def _last_pk(self):
+        return self.order_by().aggregate(last=Max('pk'))['last'] or 0
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            # Backends that do not return new pks (MySQL, or any backend
+            # with ignore_conflicts) get the ids above the previous maximum.
+            last_pk = self._last_pk() if any(obj.pk is None for obj in objs) else None
+            collection_ids = {obj.collection_id for obj in objs}
+            if kwargs.get('update_conflicts'):
+                # Products moved by the update also leave their old collection.
+                collection_ids.update(self.filter(pk__in=[obj.pk for obj in objs if obj.pk is not None])
+                                      .values_list('collection_id', flat=True))
+            created = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                Collection.objects.using(self.db).filter(pk__in=collection_ids).recount_products()
+            else:
+                Collection.objects.using(self.db).adjust_product_counts(Counter(obj.collection_id for obj in objs))
+            ids = [obj.pk for obj in objs]
+            if None in ids:
+                ids = {pk for pk in ids if pk is not None}
+                ids.update(self.filter(pk__gt=last_pk).values_list('pk', flat=True))
+                ids = sorted(ids)
+            self._send_changed(ids, None)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if 'collection' not in fields and 'collection_id' not in fields:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            previous = dict(self.filter(pk__in=[obj.pk for obj in objs]).values_list('pk', 'collection_id'))
+            updated = super().bulk_update(objs, fields, *args, **kwargs)
+            deltas = Counter()
+            for obj in objs:
+                if obj.pk in previous and previous[obj.pk] != obj.collection_id:
+                    deltas[previous[obj.pk]] -= 1
+                    deltas[obj.collection_id] += 1
+            Collection.objects.using(self.db).adjust_product_counts(deltas)
+        return updated
+
+    def update(self, **kwargs):
+        # bulk_update() also lands here, one batch at a time.
+        ids = self._changed_ids() if products_bulk_changed.has_listeners(self.model) else None
+        target = kwargs.get('collection', kwargs.get('collection_id'))
+        # Expressions come from bulk_update(), which does its own accounting.
+        if target is None or hasattr(target, 'resolve_expression'):
+            rows = super().update(**kwargs)
+        else:
+            target = getattr(target, 'pk', target)
+            with transaction.atomic(using=self.db):
+                deltas = Counter()
+                for collection_id, count in self._counts_by_collection().items():
+                    deltas[collection_id] -= count
+                    deltas[target] += count
+                rows = super().update(**kwargs)
+                Collection.objects.using(self.db).adjust_product_counts(deltas)
+        self._send_changed(ids, list(kwargs))
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            counts = self._counts_by_collection()
+            deleted = super().delete()
+            Collection.objects.using(self.db).adjust_product_counts({pk: -count for pk, count in counts.items()})
+        return deleted
+
 class Product(models.Model):
     title = models.CharField(max_length=100)
     slug = models.SlugField()
@@ -30,12 +144,52 @@ class Product(models.Model):
     collection = models.ForeignKey(Collection, on_delete=models.PROTECT, related_name='products')
     promotion = models.ManyToManyField(Promotion, blank=True)
 
+    objects = ProductQuerySet.as_manager()
+
     #setting:
     def __str__(self) -> str:
         return self.title
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Product, instance=self)
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic(using=using):
+            if self._state.adding:
+                previous = None
+            elif update_fields is not None and not {'collection', 'collection_id'} & set(update_fields):
+                previous = self.collection_id
+            else:
+                previous = Product.objects.using(using).select_for_update() \
+                    .filter(pk=self.pk).values_list('collection_id', flat=True).first()
+            super().save(*args, **kwargs)
+            if previous != self.collection_id:
+                Collection.objects.using(using).adjust_product_counts({previous: -1, self.collection_id: 1})
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Product, instance=self)
+        with transaction.atomic(using=using):
+            deleted = super().delete(*args, **kwargs)
+            Collection.objects.using(using).adjust_product_counts({self.collection_id: -1})
+        return deleted
     
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title'], name='store_product_title_idx'),
+            models.Index(fields=['collection', 'unit_price'], name='store_product_coll_price_idx'),
+            models.Index(fields=['unit_price', 'id'], name='store_product_price_id_idx'),
+            models.Index(fields=['last_update', 'id'], name='store_product_updated_id_idx'),
+        ]
+
+class ProductPrice(models.Model):
+    """The price a product sells at after its best promotion, kept up to date by store.pricing."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='price')
+    effective_price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['effective_price', 'product'], name='store_productprice_price_idx'),
+        ]
 
 class Customer(models.Model):
     MEMBERSHIP_GOLD = 'G'
@@ -78,6 +232,11 @@ class Order(models.Model):
     payment_status = models.CharField(max_length=1, choices=PAYMENT_STATUS_CHOICES, default=PAYMENT_STATUS_PENDING)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'placed_at'], name='store_order_cust_placed_idx'),
+            models.Index(fields=['placed_at'], name='store_order_placed_at_idx'),
+        ]
 
 class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='orderitems') 
@@ -91,15 +250,86 @@ class Address(models.Model):
     zip = models.PositiveBigIntegerField()
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE)
 
+def line_total(prefix=''):
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * F(f'{prefix}product__unit_price'),
+        output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(total_price=Sum(line_total('items__'))).prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.with_totals())
+        )
+
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='store_cart_created_at_idx'),
+        ]
+
+class CartItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        # Only the product columns SimpleProductSerializer renders.
+        return self.select_related('product') \
+            .only('cart', 'quantity', 'product__title', 'product__unit_price') \
+            .annotate(total_price=line_total())
+
+    def add_items(self, cart_id, quantities):
+        """
+        Adds {product_id: quantity} to the cart in one INSERT ... SELECT
+        upsert: missing lines are inserted and existing ones incremented in the
+        database, so concurrent adds neither race nor collide on the unique
+        constraint. Products that do not exist are left out by the SELECT, and
+        the FK still guards against ones deleted concurrently.
+
+        Returns the lines written, with `id`, `product_id` and `quantity`.
+        """
+        if not quantities:
+            return []
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        table, product_table, product_pk = qn(opts.db_table), qn(Product._meta.db_table), qn(Product._meta.pk.column)
+        pk, cart, product, quantity = (qn(opts.get_field(name).column) for name in ('id', 'cart', 'product', 'quantity'))
+        placeholders = ', '.join(['%s'] * len(quantities))
+        sql = (
+            f'INSERT INTO {table} ({cart}, {product}, {quantity}) '
+            f'SELECT %s, {product_pk}, CASE {product_pk} {" ".join(["WHEN %s THEN %s"] * len(quantities))} END '
+            f'FROM {product_table} WHERE {product_pk} IN ({placeholders})'
+        )
+        params = [opts.get_field('cart').get_db_prep_value(cart_id, connection)]
+        for product_id, count in quantities.items():
+            params += [product_id, count]
+        params += list(quantities)
+        if connection.vendor == 'mysql':
+            sql += f' ON DUPLICATE KEY UPDATE {quantity} = {quantity} + VALUES({quantity})'
+        else:
+            sql += f' ON CONFLICT ({cart}, {product}) DO UPDATE SET {quantity} = {table}.{quantity} + EXCLUDED.{quantity}'
+        returning = connection.features.can_return_rows_from_bulk_insert and connection.vendor != 'mysql'
+        if returning:
+            sql += f' RETURNING {pk}, {product}, {quantity}'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if returning:
+                fields = ['id', 'cart_id', 'product_id', 'quantity']
+                return [self.model.from_db(using, fields, (item_id, cart_id, product_id, count))
+                        for item_id, product_id, count in cursor.fetchall()]
+        return list(self.using(using).filter(cart_id=cart_id, product_id__in=quantities).only('id', 'cart', 'product', 'quantity'))
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, default=None, related_name='items') 
     product = models.ForeignKey(Product, on_delete=models.CASCADE) 
     quantity = models.PositiveBigIntegerField(validators=[MinValueValidator(1)])
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = [['cart', 'product']]
 
@@ -107,4 +337,9 @@ class Review(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     name = models.CharField(max_length=100)
     description = models.TextField()
-    date = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'date'], name='store_review_product_date_idx'),
+        ]
\ No newline at end of file
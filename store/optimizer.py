@@ -0,0 +1,159 @@
+import threading
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+from .fieldsets import fieldset_key
+
+
+class QueryPlan:
+    """Columns, joins and prefetches a serializer needs from its queryset."""
+
+    def __init__(self):
+        self.only = set()
+        self.select = set()
+        self.prefetch = {}
+
+    def apply(self, queryset, trim=True):
+        names, defer = queryset.query.deferred_loading
+        can_trim = trim and not names and defer and queryset._fields is None and queryset.query.select_related is not True
+        existing_select = _paths(queryset.query.select_related) if isinstance(queryset.query.select_related, dict) else []
+        existing_prefetch = [
+            lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            for lookup in queryset._prefetch_related_lookups
+        ]
+
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        for path, (model, plan) in self.prefetch.items():
+            if any(path == seen or path.startswith(seen + '__') or seen.startswith(path + '__') for seen in existing_prefetch):
+                continue
+            queryset = queryset.prefetch_related(Prefetch(path, queryset=plan.apply(model._default_manager.all())))
+        if can_trim:
+            queryset = queryset.only(*self.only, *existing_select)
+        return queryset
+
+
+def _paths(select_related, prefix=''):
+    paths = []
+    for name, nested in select_related.items():
+        paths.append(prefix + name)
+        paths.extend(_paths(nested, prefix + name + '__'))
+    return paths
+
+
+def _get_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _load_all(model, prefix, plan):
+    plan.only.update(prefix + field.name for field in model._meta.concrete_fields)
+
+
+def _follow(model, attrs, prefix, plan):
+    # Dotted sources such as 'customer.user' join through to-one relations.
+    path = prefix
+    for attr in attrs:
+        relation = _get_field(model, attr)
+        if relation is None or not (relation.many_to_one or relation.one_to_one):
+            return None, None
+        path += relation.name
+        plan.select.add(path)
+        plan.only.add(path)
+        model, path = relation.related_model, path + '__'
+    return model, path
+
+
+def _walk(model, serializer, prefix, plan):
+    full = False
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+            full = True
+            continue
+
+        attrs = field.source_attrs
+        field_model, path = _follow(model, attrs[:-1], prefix, plan)
+        if field_model is None:
+            full = True
+            continue
+
+        model_field = _get_field(field_model, attrs[-1])
+        if model_field is None:
+            # Annotations are loaded regardless of only(); properties and
+            # methods may read any column.
+            if hasattr(field_model, attrs[-1]):
+                _load_all(field_model, path, plan)
+            continue
+        if not model_field.is_relation or attrs[-1] == getattr(model_field, 'attname', None) != model_field.name:
+            plan.only.add(path + model_field.name)
+            continue
+
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        child = child.child_relation if isinstance(child, ManyRelatedField) else child
+        related = model_field.related_model
+        path += model_field.name
+        if model_field.one_to_many or model_field.many_to_many:
+            child_plan = QueryPlan()
+            if isinstance(child, serializers.BaseSerializer):
+                _walk(related, child, '', child_plan)
+            if model_field.one_to_many:
+                child_plan.only.add(model_field.field.name)
+            plan.prefetch[path] = (related, child_plan)
+        elif isinstance(child, serializers.BaseSerializer):
+            plan.select.add(path)
+            plan.only.add(path)
+            _walk(related, child, path + '__', plan)
+        elif isinstance(child, PrimaryKeyRelatedField) and child.pk_field is None:
+            plan.only.add(path)
+        else:
+            plan.select.add(path)
+            plan.only.add(path)
+    if full:
+        _load_all(model, prefix, plan)
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def get_query_plan(serializer, key=None):
+    """Build (and cache per serializer class and `key`) the plan for a serializer instance."""
+    cache_key = (type(serializer), key)
+    with _plans_lock:
+        plan = _plans.get(cache_key)
+    if plan is None:
+        model = serializer.Meta.model
+        plan = QueryPlan()
+        _walk(model, serializer, '', plan)
+        with _plans_lock:
+            _plans[cache_key] = plan
+    return plan
+
+
+def optimize_queryset(queryset, serializer, key=None, trim=True):
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return queryset
+    return get_query_plan(serializer, key).apply(queryset, trim)
+
+
+class QueryOptimizerMixin:
+    """
+    Applies select_related/prefetch_related derived from the active serializer
+    to every queryset the view filters, and only() on safe methods. Writes
+    keep full rows so that save() still touches every column (auto_now).
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        trim = self.request.method in SAFE_METHODS
+        serializer_class = self.get_serializer_class()
+        serializer = serializer_class(context=self.get_serializer_context())
+        # Sparse fieldsets (store.fieldsets) get a plan of their own.
+        return optimize_queryset(queryset, serializer, key=fieldset_key(serializer_class, self.request), trim=trim)
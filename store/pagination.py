@@ -1,4 +1,173 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .stats import planner_count
 
 class DefaultPagination(PageNumberPagination):
-    page_size = 10
\ No newline at end of file
+    page_size = 10
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-based pagination: each page is fetched with a `WHERE (field, id) > (...)`
+    condition instead of an OFFSET, so page 500 costs the same as page 1.
+
+    The page is ordered by the first valid `ordering` term of the view (or by
+    `id` alone), with `id` as the tie-breaker. The total is only computed when
+    the client asks for it with `?count=exact` or `?count=estimate`; the
+    latter is exact (`count_is_estimate` false) on databases without a
+    planner estimate.
+    """
+    page_size = DefaultPagination.page_size
+    mode_query_param = 'pagination'
+    mode_query_value = 'keyset'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering_param = 'ordering'
+    tie_breaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == cls.mode_query_value or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field, self.descending = self.get_ordering(request, view)
+        self.count, self.count_is_estimate = self.get_count(queryset, request)
+
+        cursor = self.decode_cursor(request, queryset)
+        reverse = bool(cursor and cursor['reverse'])
+        descending = self.descending != reverse
+        if cursor:
+            queryset = queryset.filter(self.get_seek_filter(cursor['position'], descending))
+        queryset = queryset.order_by(*self.get_order_by(descending))
+        loaded, deferred = queryset.query.deferred_loading
+        if loaded and not deferred and self.field not in queryset.query.annotations:
+            queryset = queryset.only(*loaded, self.field)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_ordering(self, request, view):
+        valid_fields = getattr(view, 'ordering_fields', None) or []
+        terms = request.query_params.get(self.ordering_param, '')
+        for term in terms.split(','):
+            term = term.strip()
+            if term.lstrip('-') in valid_fields:
+                return term.lstrip('-'), term.startswith('-')
+        return self.tie_breaker, False
+
+    def get_order_by(self, descending):
+        prefix = '-' if descending else ''
+        if self.field == self.tie_breaker:
+            return [prefix + self.tie_breaker]
+        return [prefix + self.field, prefix + self.tie_breaker]
+
+    def get_seek_filter(self, position, descending):
+        lookup = 'lt' if descending else 'gt'
+        value, pk = position
+        after_pk = Q(**{f'{self.tie_breaker}__{lookup}': pk})
+        if self.field == self.tie_breaker:
+            return after_pk
+        return Q(**{f'{self.field}__{lookup}': value}) | (Q(**{self.field: value}) & after_pk)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count(), False
+        if mode == 'estimate':
+            # Exact where the database has no estimate to offer.
+            count = planner_count(queryset)
+            return (queryset.count(), False) if count is None else (count, True)
+        return None, False
+
+    def get_position(self, item):
+        value = getattr(item, self.field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        return [value, getattr(item, self.tie_breaker)]
+
+    def encode_cursor(self, position, reverse):
+        payload = {'o': self.field, 'd': self.descending, 'p': position, 'r': reverse}
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_model_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()))
+            position = payload['p']
+            reverse = bool(payload['r'])
+            if payload['o'] != self.field or payload['d'] != self.descending or len(position) != 2:
+                raise ValueError
+            # Cursors come from the client; the lookups need values of the field's type.
+            position = [self.get_model_field(queryset, name).to_python(value)
+                        for name, value in zip((self.field, self.tie_breaker), position)]
+            if None in position:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return {'position': position, 'reverse': reverse}
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), True)
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response['count'] = self.count
+            response['count_is_estimate'] = self.count_is_estimate
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'count_is_estimate': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
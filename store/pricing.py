@@ -0,0 +1,60 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from . import models
+from .bulk import batched, iter_chunks
+
+BATCH_SIZE = 2000
+CENT = Decimal('0.01')
+
+
+def effective_prices(prices, discounts):
+    """
+    Effective prices for parallel columns of base prices and discounts, the
+    latter as fractions of the price (0.25 takes a quarter off), clamped to
+    [0, 1] and rounded to the cent.
+    """
+    return [
+        (price * (1 - min(max(Decimal(str(discount)), 0), 1))).quantize(CENT, ROUND_HALF_UP)
+        for price, discount in zip(prices, discounts)
+    ]
+
+
+def best_discounts(ids, using='default'):
+    """{product id: largest discount among its promotions}, for the `ids` that have any."""
+    through = models.Product.promotion.through
+    return dict(through.objects.using(using).filter(product_id__in=ids).order_by()
+                .values_list('product_id').annotate(Max('promotion__discount')))
+
+
+def write_prices(rows, using='default'):
+    """Prices and stores (product id, unit price) rows: one discount query and one upsert."""
+    ids = [pk for pk, _ in rows]
+    discounts = best_discounts(ids, using)
+    prices = effective_prices([price for _, price in rows], [discounts.get(pk, 0) for pk in ids])
+    target = {'unique_fields': ['product']} if connections[using].features.supports_update_conflicts_with_target else {}
+    models.ProductPrice.objects.using(using).bulk_create(
+        [models.ProductPrice(product_id=pk, effective_price=price) for pk, price in zip(ids, prices)],
+        update_conflicts=True, update_fields=['effective_price'], **target
+    )
+    return len(ids)
+
+
+def refresh_prices(ids=None, using='default', batch_size=BATCH_SIZE):
+    """
+    Recomputes the effective prices of the products with `ids`, or of every
+    product when None, `batch_size` products at a time. Returns how many were
+    priced.
+    """
+    products = models.Product.objects.using(using).order_by('pk').values_list('pk', 'unit_price')
+    if ids is None:
+        chunks = iter_chunks(products, batch_size)
+    else:
+        chunks = (list(products.filter(pk__in=batch)) for batch in batched(sorted(set(ids)), batch_size))
+    total = 0
+    for chunk in chunks:
+        with transaction.atomic(using=using):
+            total += write_prices(chunk, using)
+    return total
@@ -0,0 +1,61 @@
+import codecs
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes and dataclasses go through DRF's encoder, which formats them
+    # differently from orjson.
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# orjson reads integers beyond 64 bits as floats; bodies that may hold one
+# are parsed by JSONParser instead.
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed, producing the
+    same bytes. Indented output, non-default JSON settings and values orjson
+    cannot encode (such as integers beyond 64 bits) go through JSONRenderer.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact or not self.strict \
+                or self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these for JavaScript (see its render()).
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes UTF-8 bodies with orjson, and anything orjson would get wrong with JSONParser."""
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        # Same errors as before.
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+RENDERER_CLASSES = [FastJSONRenderer, BrowsableAPIRenderer]
+PARSER_CLASSES = [FastJSONParser, FormParser, MultiPartParser]
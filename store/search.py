@@ -0,0 +1,222 @@
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from . import models
+
+SEARCH_TABLE = 'store_product_search'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class SearchBackend:
+    """
+    Full-text search over `Product.title` and `Product.description`.
+
+    `search()` returns the queryset narrowed to matching products, annotated
+    with `search_rank` (higher is more relevant) and ordered by it.
+    """
+    def __init__(self, using='default'):
+        self.using = using
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+    def index(self, products):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class MySQLFullTextBackend(SearchBackend):
+    match_sql = 'MATCH ({table}.title, {table}.description) AGAINST (%s IN BOOLEAN MODE)'
+
+    def search(self, queryset, terms):
+        tokens = tokenize(terms)
+        if not tokens:
+            return queryset.none()
+        query = ' '.join(f'+{token}*' for token in tokens)
+        match = self.match_sql.format(table=models.Product._meta.db_table)
+        return queryset.annotate(
+            search_rank=RawSQL(match, [query], output_field=FloatField())
+        ).filter(search_rank__gt=0).order_by('-search_rank', 'id')
+
+
+class SQLiteFTSBackend(SearchBackend):
+    batch_size = 500
+
+    def search(self, queryset, terms):
+        tokens = tokenize(terms)
+        if not tokens:
+            return queryset.none()
+        query = ' '.join(f'"{token}"*' for token in tokens)
+        table = models.Product._meta.db_table
+        return queryset.extra(
+            select={'search_rank': f'-bm25({SEARCH_TABLE})'},
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.rowid = {table}.id', f'{SEARCH_TABLE} MATCH %s'],
+            params=[query],
+        ).order_by('-search_rank', 'id')
+
+    def index(self, products):
+        rows = [(product.pk, product.title, product.description or '') for product in products]
+        with connections[self.using].cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                self._delete(cursor, [row[0] for row in batch])
+                cursor.execute(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, title, description) VALUES '
+                    + ', '.join(['(%s, %s, %s)'] * len(batch)),
+                    [value for row in batch for value in row],
+                )
+
+    def remove(self, ids):
+        ids = list(ids)
+        with connections[self.using].cursor() as cursor:
+            for start in range(0, len(ids), self.batch_size):
+                self._delete(cursor, ids[start:start + self.batch_size])
+
+    def _delete(self, cursor, ids):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids)
+
+    def rebuild(self):
+        table = models.Product._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, title, description) '
+                f"SELECT id, title, COALESCE(description, '') FROM {table}"
+            )
+
+
+class InvertedIndexBackend(SearchBackend):
+    """
+    In-process index for databases without native full-text support.
+
+    Built lazily from the product table and kept current by the product
+    signals. Scores are TF-IDF with titles weighted above descriptions;
+    only the best `max_results` matches are returned.
+    """
+    title_weight = 3
+    max_results = 1000
+
+    def __init__(self, using='default'):
+        super().__init__(using)
+        self._lock = threading.RLock()
+        self._postings = None
+        self._documents = {}
+        self._tokens = []
+
+    def search(self, queryset, terms):
+        tokens = tokenize(terms)
+        if not tokens:
+            return queryset.none()
+        with self._lock:
+            self._ensure_built()
+            scores = None
+            for token in tokens:
+                token_scores = self._score_prefix(token)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pk: scores[pk] + score for pk, score in token_scores.items() if pk in scores}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:self.max_results]
+        if not ranked:
+            return queryset.none()
+        rank = Case(*[When(pk=pk, then=Value(score)) for pk, score in ranked], output_field=FloatField())
+        return queryset.filter(pk__in=[pk for pk, _ in ranked]).annotate(search_rank=rank).order_by('-search_rank', 'id')
+
+    def index(self, products):
+        documents = [(product.pk, product.title, product.description) for product in products]
+        transaction.on_commit(lambda: self._add(documents), using=self.using)
+
+    def remove(self, ids):
+        ids = list(ids)
+        transaction.on_commit(lambda: self._discard(ids), using=self.using)
+
+    def rebuild(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            rows = models.Product.objects.using(self.using).values_list('id', 'title', 'description')
+            self._add(rows.iterator(chunk_size=2000))
+
+    def _ensure_built(self):
+        if self._postings is None:
+            self.rebuild()
+
+    def _add(self, documents):
+        with self._lock:
+            if self._postings is None:
+                return
+            for pk, title, description in documents:
+                self._discard([pk], sort=False)
+                weights = defaultdict(int)
+                for token in tokenize(title):
+                    weights[token] += self.title_weight
+                for token in tokenize(description):
+                    weights[token] += 1
+                for token, weight in weights.items():
+                    self._postings[token][pk] = weight
+                self._documents[pk] = list(weights)
+            self._tokens = sorted(self._postings)
+
+    def _discard(self, ids, sort=True):
+        with self._lock:
+            if self._postings is None:
+                return
+            for pk in ids:
+                for token in self._documents.pop(pk, ()):
+                    postings = self._postings[token]
+                    postings.pop(pk, None)
+                    if not postings:
+                        del self._postings[token]
+            if sort:
+                self._tokens = sorted(self._postings)
+
+    def _score_prefix(self, prefix):
+        total = max(len(self._documents), 1)
+        scores = defaultdict(float)
+        position = bisect_left(self._tokens, prefix)
+        while position < len(self._tokens) and self._tokens[position].startswith(prefix):
+            postings = self._postings[self._tokens[position]]
+            idf = math.log(1 + total / len(postings))
+            for pk, weight in postings.items():
+                scores[pk] += weight * idf
+            position += 1
+        return scores
+
+
+BACKENDS = {
+    'mysql': MySQLFullTextBackend,
+    'sqlite': SQLiteFTSBackend,
+    'python': InvertedIndexBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(using='default'):
+    with _backends_lock:
+        if using not in _backends:
+            name = getattr(settings, 'STORE_SEARCH_BACKEND', 'auto')
+            if name == 'auto':
+                vendor = connections[using].vendor
+                name = vendor if vendor in BACKENDS else 'python'
+            _backends[using] = BACKENDS[name](using)
+        return _backends[using]
@@ -0,0 +1,92 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth import get_user_model
+
+from . import models
+
+WORDS = [
+    'organic', 'coffee', 'bean', 'roast', 'dark', 'light', 'tea', 'green', 'herbal', 'chocolate',
+    'almond', 'milk', 'oat', 'bread', 'sourdough', 'cheese', 'aged', 'cheddar', 'olive', 'oil',
+    'pasta', 'sauce', 'tomato', 'basil', 'spicy', 'pepper', 'salt', 'sea', 'honey', 'wild',
+]
+
+
+def words(rng, count):
+    return ' '.join(rng.choices(WORDS, k=count))
+
+
+def price(rng):
+    return Decimal(rng.randint(100, 99999)) / 100
+
+
+def seed_catalog(rng, products, collections=10, prefix='seed', batch_size=1000):
+    titles = [f'{prefix} {words(rng, 2)} {index}' for index in range(collections)]
+    models.Collection.objects.bulk_create([models.Collection(title=title) for title in titles])
+    collection_ids = list(models.Collection.objects.filter(title__in=titles).order_by('id').values_list('id', flat=True))
+    models.Product.objects.bulk_create([
+        models.Product(
+            title=words(rng, 3).capitalize(),
+            slug=f'{prefix}-{index}',
+            description=words(rng, 40),
+            unit_price=price(rng),
+            inventory=rng.randint(1000, 5000),
+            collection_id=rng.choice(collection_ids),
+        ) for index in range(products)
+    ], batch_size=batch_size)
+    product_ids = list(
+        models.Product.objects.filter(slug__startswith=f'{prefix}-').order_by('id').values_list('id', flat=True)
+    )
+    return collection_ids, product_ids
+
+
+def seed_customers(rng, count, prefix='seed', is_staff=False):
+    User = get_user_model()
+    password = make_password(None)
+    usernames = [f'{prefix}{index}' for index in range(count)]
+    User.objects.bulk_create([
+        User(username=username, email=f'{username}@example.com', password=password,
+             first_name=words(rng, 1).capitalize(), last_name=words(rng, 1).capitalize(), is_staff=is_staff)
+        for username in usernames
+    ])
+    users = list(User.objects.filter(username__in=usernames).order_by('id'))
+    models.Customer.objects.bulk_create([
+        models.Customer(user=user, phone=str(rng.randint(10 ** 9, 10 ** 10 - 1))) for user in users
+    ])
+    return users
+
+
+def seed_orders(rng, users, product_ids, per_customer=5, items_per_order=4, batch_size=1000):
+    customer_ids = list(models.Customer.objects.filter(user__in=users).values_list('id', flat=True))
+    models.Order.objects.bulk_create([
+        models.Order(customer_id=customer_id, payment_status=rng.choice('PCF'))
+        for customer_id in customer_ids for _ in range(per_customer)
+    ], batch_size=batch_size)
+    order_ids = models.Order.objects.filter(customer_id__in=customer_ids).values_list('id', flat=True)
+    prices = dict(models.Product.objects.filter(id__in=product_ids).values_list('id', 'unit_price'))
+    models.OrderItem.objects.bulk_create([
+        models.OrderItem(order_id=order_id, product_id=product_id, unit_price=prices[product_id],
+                         quantity=rng.randint(1, 5))
+        for order_id in order_ids
+        for product_id in rng.sample(product_ids, min(items_per_order, len(product_ids)))
+    ], batch_size=batch_size)
+
+
+def seed_dataset(rng, products=2000, collections=10, customers=20, orders_per_customer=5, prefix='seed'):
+    """A small but realistically shaped store for benchmarks."""
+    collection_ids, product_ids = seed_catalog(rng, products, collections, prefix)
+    users = seed_customers(rng, customers, prefix)
+    staff, = seed_customers(rng, 1, f'{prefix}staff', is_staff=True)
+    seed_orders(rng, users + [staff], product_ids, orders_per_customer)
+    return SimpleNamespace(collection_ids=collection_ids, product_ids=product_ids, users=users, staff=staff)
+
+
+def skewed(rng, count, skew):
+    """An index in range(count); skew > 1 concentrates picks on the low (hot) indexes."""
+    return min(count - 1, int(count * rng.random() ** skew))
+
+
+def fixed_price(pk):
+    """Deterministic unit price of a generated product, so order items can be priced without a lookup."""
+    return Decimal(pk * 7919 % 99900 + 100) / 100
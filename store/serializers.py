@@ -1,20 +1,100 @@
+from collections import Counter
+
 from rest_framework import serializers
+from django.contrib.auth.models import AnonymousUser
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Manager, Value, When
+from likes.models import LikeCount, LikedItem
+from tags.models import TaggedItem
 from . import models
+from .customers import get_customer_id
+from .fieldsets import SparseFieldsMixin
+
+class OutOfStock(serializers.ValidationError):
+    default_code = 'out_of_stock'
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__({'out_of_stock': [
+            f'Product {pk}: requested {requested}, {available} available.'
+            if available is not None else f'Product {pk}: not enough inventory for {requested}.'
+            for pk, requested, available in shortages
+        ]})
 
-class CollectionSerializer(serializers.ModelSerializer):
+class CollectionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Collection
         fields = ['id', 'title', 'product_count']
     
-    product_count = serializers.IntegerField()
+    product_count = serializers.IntegerField(read_only=True)
+
+class LikesField(serializers.ReadOnlyField):
+    """A like count or liked-by-me flag, read from what ProductSerializer.preload() fetched."""
+    def __init__(self, key, **kwargs):
+        self.key = key
+        super().__init__(source='id', **kwargs)
+
+    def to_representation(self, pk):
+        return self.parent.get_likes(pk)[self.key]
+
+class TagsField(serializers.ReadOnlyField):
+    """The product's tag labels, read from what ProductSerializer.preload() fetched."""
+    def __init__(self, **kwargs):
+        super().__init__(source='id', **kwargs)
+
+    def to_representation(self, pk):
+        return self.parent.get_tags(pk)
+
+class ProductListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, Manager) else data)
+        self.child.preload([product.pk for product in products])
+        return super().to_representation(products)
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = models.Product
+        fields = ['id', 'title', 'slug', 'inventory', 'unit_price', 'collection', 'effective_price', 'likes_count', 'liked', 'tags']
+        list_serializer_class = ProductListSerializer
+
+    effective_price = serializers.DecimalField(source='price.effective_price', max_digits=6, decimal_places=2,
+                                               read_only=True)
+    likes_count = LikesField('count')
+    liked = LikesField('liked')
+    tags = TagsField()
+
+    def preload(self, ids):
+        """Fetch the like counts, the user's likes and the tags for a page of products, one query each."""
+        loaded = getattr(self, '_preloaded', set())
+        if set(ids) <= loaded:
+            return
+        request = self.context.get('request')
+        user = getattr(request, 'user', AnonymousUser())
+        # Only what the (possibly sparse) fieldset renders.
+        fields = self.fields
+        self._like_counts = LikeCount.objects.for_objects(models.Product, ids) if 'likes_count' in fields else {}
+        self._liked = LikedItem.objects.liked_by(user, models.Product, ids) if 'liked' in fields else set()
+        self._tags = TaggedItem.objects.for_model(models.Product, ids) if 'tags' in fields else {}
+        self._preloaded = set(ids)
+
+    def get_likes(self, pk):
+        self.preload([pk])
+        return {'count': self._like_counts.get(pk, 0), 'liked': pk in self._liked}
+
+    def get_tags(self, pk):
+        self.preload([pk])
+        return self._tags.get(pk, [])
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    # Collections are checked once per batch by store.bulk, not once per row.
+    id = serializers.IntegerField(required=False, min_value=1)
+    collection = serializers.IntegerField(source='collection_id', min_value=1)
 
-class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Product
-        fields = ['id', 'title', 'slug', 'inventory', 'unit_price', 'collection']
+        fields = ['id', 'title', 'slug', 'description', 'unit_price', 'inventory', 'collection']
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Review
         fields = ['id', 'name', 'description', 'date']
@@ -28,11 +108,13 @@ class SimpleProductSerializer(serializers.ModelSerializer):
         model = models.Product
         fields = ['id', 'title', 'unit_price']
         
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = SimpleProductSerializer()
     total_price = serializers.SerializerMethodField()
     
     def get_total_price(self, cartitem: models.CartItem):
+        if hasattr(cartitem, 'total_price'):
+            return cartitem.total_price
         return cartitem.quantity * cartitem.product.unit_price
     
     class Meta:
@@ -42,45 +124,53 @@ class CartItemSerializer(serializers.ModelSerializer):
 class AddCartSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        if not models.Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('Product does not exist')
-        return value
-            
     def save(self, **kwargs):
-        product_id = self.validated_data['product_id']
-        quantity = self.validated_data['quantity']
-        cart_id = self.context['cart_id']
-
-        try:
-            self.instance = models.CartItem.objects.get(product_id=product_id, cart_id=cart_id)
-            self.instance.quantity += quantity
-            self.instance.save()
-        except models.CartItem.DoesNotExist:
-            self.instance = models.CartItem.objects.create(cart_id=cart_id, **self.validated_data)
+        # One upsert; an unknown product simply writes no line.
+        quantities = {self.validated_data['product_id']: self.validated_data['quantity']}
+        items = models.CartItem.objects.add_items(self.context['cart_id'], quantities)
+        if not items:
+            raise serializers.ValidationError({'product_id': ['Product does not exist']})
+        self.instance = items[0]
         return self.instance
         
     class Meta:
         model = models.CartItem
         fields = ['id', 'product_id', 'quantity']
 
+class AddCartItemsSerializer(serializers.Serializer):
+    items = AddCartSerializer(many=True, allow_empty=False)
+
+    def save(self, **kwargs):
+        quantities = Counter()
+        for item in self.validated_data['items']:
+            quantities[item['product_id']] += item['quantity']
+        with transaction.atomic():
+            items = models.CartItem.objects.add_items(self.context['cart_id'], quantities)
+            missing = quantities.keys() - {item.product_id for item in items}
+            if missing:
+                raise serializers.ValidationError({'items': [f'Product {pk} does not exist' for pk in sorted(missing)]})
+        self.instance = {'items': items}
+        return self.instance
+
 class UpdateCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.CartItem
         fields = ['quantity']
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     items = CartItemSerializer(read_only=True, many=True)
     total_price = serializers.SerializerMethodField()
 
     def get_total_price(self, cart: models.Cart):
+        if hasattr(cart, 'total_price'):
+            return cart.total_price or 0
         return sum([item.quantity * item.product.unit_price for item in cart.items.all()])
     class Meta:
         model = models.Cart
         fields = ['id', 'items', 'total_price']
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_id = serializers.IntegerField(read_only=True)
     
     class Meta:
@@ -94,7 +184,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'unit_price', 'quantity']
         model = models.OrderItem
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     
     class Meta:
@@ -109,31 +199,50 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
-    def validat_cart_id(self, cart_id):
-        if not models.Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError('No cart with the given ID was found.')
-        if models.CartItem.objects.filter(pk=cart_id).count() == 0:
+    def validate_cart_id(self, cart_id):
+        if not models.CartItem.objects.filter(cart_id=cart_id).exists():
+            if not models.Cart.objects.filter(pk=cart_id).exists():
+                raise serializers.ValidationError('No cart with the given ID was found.')
             raise serializers.ValidationError('there is no item in the cart.')
         return cart_id
     
     def save(self, **kwargs):
+        cart_id = self.validated_data['cart_id']
+        customer_id = get_customer_id(self.context['user'], create=True)
+
         with transaction.atomic():
-            cart_id = self.validated_data['cart_id']
-            customer, created = models.Customer.objects.get_or_create(user=self.context['user'])
-            order = models.Order.objects.create(customer=customer)
-
-            cart_items = models.CartItem.objects.filter(cart_id=cart_id)
-
-            order_items = [
-                models.OrderItem(
-                    product=item.product,
-                    unit_price=item.product.unit_price,
-                    quantity=item.quantity,
-                    order=order
-                ) for item in cart_items
+            quantities = dict(
+                models.CartItem.objects.filter(cart_id=cart_id).order_by('product_id').values_list('product_id', 'quantity')
+            )
+            # Lock the products in primary key order so concurrent checkouts
+            # over overlapping carts always queue instead of deadlocking.
+            products = {
+                pk: (unit_price, inventory) for pk, unit_price, inventory in
+                models.Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk')
+                .values_list('pk', 'unit_price', 'inventory')
+            }
+            shortages = [
+                (pk, quantity, products[pk][1] if pk in products else 0)
+                for pk, quantity in quantities.items()
+                if pk not in products or products[pk][1] < quantity
             ]
-
-            models.OrderItem.objects.bulk_create(order_items)
+            if not quantities:
+                raise serializers.ValidationError({'cart_id': ['there is no item in the cart.']})
+            if shortages:
+                raise OutOfStock(shortages)
+
+            requested = Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+                             output_field=IntegerField())
+            reserved = models.Product.objects.filter(pk__in=quantities, inventory__gte=requested) \
+                .update(inventory=F('inventory') - requested)
+            if reserved != len(quantities):
+                raise OutOfStock([(pk, quantity, None) for pk, quantity in quantities.items()])
+
+            order = models.Order.objects.create(customer_id=customer_id)
+            models.OrderItem.objects.bulk_create([
+                models.OrderItem(order=order, product_id=pk, unit_price=products[pk][0], quantity=quantity)
+                for pk, quantity in quantities.items()
+            ])
             models.Cart.objects.filter(pk=cart_id).delete()
 
-            return order
\ No newline at end of file
+            return order
@@ -0,0 +1,189 @@
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from likes.models import LikedItem
+from tags.models import Tag, TaggedItem
+
+from . import caching, models
+from .bulk import batched
+from .customers import invalidate_customer
+from .pricing import refresh_prices
+from .search import get_search_backend
+
+SEARCH_FIELDS = {'title', 'description'}
+COLLECTION_FIELDS = {'collection', 'collection_id'}
+PRICE_FIELDS = {'unit_price'}
+
+
+@receiver(post_save, sender=models.Product)
+def index_product(sender, instance, update_fields=None, using='default', **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    get_search_backend(using).index([instance])
+
+
+@receiver(post_delete, sender=models.Product)
+def unindex_product(sender, instance, using='default', **kwargs):
+    get_search_backend(using).remove([instance.pk])
+
+
+@receiver(models.products_bulk_changed)
+def index_changed_products(sender, ids, fields, using='default', **kwargs):
+    if fields is not None and not SEARCH_FIELDS & set(fields):
+        return
+    backend = get_search_backend(using)
+    if ids is None:
+        transaction.on_commit(backend.rebuild, using=using)
+        return
+    for batch in batched(ids, models.ProductQuerySet.changed_ids_limit):
+        backend.index(models.Product.objects.using(using).filter(pk__in=batch).only('title', 'description'))
+
+
+@receiver(post_save, sender=models.Product)
+def invalidate_saved_product(sender, instance, update_fields=None, using='default', **kwargs):
+    names = ['products', f'product:{instance.pk}']
+    if update_fields is None or COLLECTION_FIELDS & set(update_fields):
+        names.append('collections')
+    caching.invalidate(names, using)
+
+
+@receiver(post_delete, sender=models.Product)
+def invalidate_deleted_product(sender, instance, using='default', **kwargs):
+    caching.invalidate(['products', f'product:{instance.pk}', 'collections'], using)
+
+
+@receiver(models.products_bulk_changed)
+def invalidate_changed_products(sender, ids, fields, using='default', **kwargs):
+    if ids is None or len(ids) > models.ProductQuerySet.changed_ids_limit:
+        names = ['products', 'products:bulk']
+    else:
+        names = ['products'] + [f'product:{pk}' for pk in ids]
+    if fields is None or COLLECTION_FIELDS & set(fields):
+        names.append('collections')
+    caching.invalidate(names, using)
+
+
+@receiver(post_save, sender=models.Collection)
+@receiver(post_delete, sender=models.Collection)
+def invalidate_collection(sender, using='default', **kwargs):
+    caching.invalidate(['collections'], using)
+
+
+@receiver(post_save, sender=models.Promotion)
+@receiver(post_delete, sender=models.Promotion)
+def invalidate_promotion(sender, using='default', **kwargs):
+    caching.invalidate(['products', 'products:bulk'], using)
+
+
+@receiver(m2m_changed, sender=models.Product.promotion.through)
+def invalidate_product_promotions(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        names = [f'product:{instance.pk}']
+    elif pk_set:
+        names = [f'product:{pk}' for pk in pk_set]
+    else:
+        names = ['products:bulk']
+    caching.invalidate(['products', *names], using)
+
+
+@receiver(post_save, sender=LikedItem)
+@receiver(post_delete, sender=LikedItem)
+def invalidate_liked_product(sender, instance, using='default', **kwargs):
+    if instance.content_type_id == ContentType.objects.db_manager(using).get_for_model(models.Product).id:
+        caching.invalidate(['products', f'product:{instance.object_id}'], using)
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def invalidate_tagged_product(sender, instance, using='default', **kwargs):
+    if instance.content_type_id == ContentType.objects.db_manager(using).get_for_model(models.Product).id:
+        caching.invalidate(['products', f'product:{instance.object_id}'], using)
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_tag(sender, using='default', **kwargs):
+    # A relabel shows on every product carrying the tag; deletes cascade
+    # through TaggedItem's post_delete instead.
+    caching.invalidate(['products', 'products:bulk'], using)
+
+
+@receiver(post_save, sender=models.Product)
+def reprice_saved_product(sender, instance, update_fields=None, using='default', **kwargs):
+    if update_fields is None or PRICE_FIELDS & set(update_fields):
+        refresh_prices([instance.pk], using)
+
+
+@receiver(models.products_bulk_changed)
+def reprice_changed_products(sender, ids, fields, using='default', **kwargs):
+    if fields is not None and not PRICE_FIELDS & set(fields):
+        return
+    if ids is None:
+        transaction.on_commit(lambda: refresh_prices(using=using), using=using)
+    else:
+        refresh_prices(ids, using)
+
+
+BULK_CHANGE_RECEIVERS = [index_changed_products, invalidate_changed_products, reprice_changed_products]
+
+
+@contextmanager
+def bulk_changes_deferred():
+    """
+    Disconnects the products_bulk_changed receivers, for loaders that index,
+    reprice and invalidate once at the end instead of once per batch.
+    """
+    for receiver_function in BULK_CHANGE_RECEIVERS:
+        models.products_bulk_changed.disconnect(receiver_function)
+    try:
+        yield
+    finally:
+        for receiver_function in BULK_CHANGE_RECEIVERS:
+            models.products_bulk_changed.connect(receiver_function)
+
+
+def promoted_product_ids(promotion, using):
+    return list(models.Product.promotion.through.objects.using(using).filter(promotion=promotion)
+                .values_list('product_id', flat=True))
+
+
+@receiver(post_save, sender=models.Promotion)
+def reprice_promotion(sender, instance, created, using='default', **kwargs):
+    if not created:
+        refresh_prices(promoted_product_ids(instance, using), using)
+
+
+@receiver(pre_delete, sender=models.Promotion)
+def remember_promoted_products(sender, instance, using='default', **kwargs):
+    # Its product links are gone by post_delete.
+    instance._promoted_product_ids = promoted_product_ids(instance, using)
+
+
+@receiver(post_delete, sender=models.Promotion)
+def reprice_deleted_promotion(sender, instance, using='default', **kwargs):
+    refresh_prices(getattr(instance, '_promoted_product_ids', []), using)
+
+
+@receiver(m2m_changed, sender=models.Product.promotion.through)
+def reprice_product_promotions(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._promoted_product_ids = promoted_product_ids(instance, using)
+    elif action.startswith('post_'):
+        if not reverse:
+            ids = [instance.pk]
+        elif pk_set is not None:
+            ids = pk_set
+        else:
+            ids = getattr(instance, '_promoted_product_ids', [])
+        refresh_prices(ids, using)
+
+
+@receiver(post_save, sender=models.Customer)
+@receiver(post_delete, sender=models.Customer)
+def evict_customer_id(sender, instance, **kwargs):
+    invalidate_customer(instance.user_id)
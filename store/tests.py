@@ -1,3 +1,814 @@
-from django.test import TestCase
+import csv
+import json
+from contextlib import contextmanager
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import product as combinations
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import checks
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework.utils.urls import replace_query_param
+
+from core.authentication import clear_caches
+from likes.models import LikedItem
+from tags.models import Tag, TaggedItem
+
+from . import bulk, fastpath, models, renderers, search, serializers, tasks
+from .customers import customer_ids
+
+# With a replica configured (STOREFRONT_SQLITE_REPLICA), read views would query
+# it, and it cannot see the rows these tests write inside their transactions.
+PRIMARY_ONLY = {'REPLICAS': []}
+
+
+@override_settings(STORE_RESPONSE_CACHE={'ENABLED': False}, REPLICA_ROUTING=PRIMARY_ONLY)
+class QueryBudgetTests(APITestCase):
+    """
+    Queries per request on the hot endpoints, which must not depend on the
+    number of rows rendered. Clients are force-authenticated, so the counts
+    leave out the token lookups that QUERY_INSTRUMENTATION['BUDGETS'] allow for.
+    """
+    products_per_page = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        collections = [models.Collection.objects.create(title=f'Collection {index}') for index in range(3)]
+        promotion = models.Promotion.objects.create(discount=0.1)
+        cls.user = get_user_model().objects.create_user(username='shopper', email='shopper@example.com',
+                                                        password='secret')
+        cls.customer = models.Customer.objects.create(user=cls.user)
+        content_type = ContentType.objects.get_for_model(models.Product)
+        tags = [Tag.objects.create(label=f'tag-{index}') for index in range(3)]
+        cls.products = []
+        for index in range(cls.products_per_page + 2):
+            product = models.Product.objects.create(
+                title=f'Product {index}', slug=f'product-{index}', description=f'Product {index}',
+                unit_price=Decimal(10 + index), inventory=100, collection=collections[index % len(collections)],
+            )
+            product.promotion.add(promotion)
+            models.Review.objects.create(product=product, name='Reviewer', description='Fine')
+            TaggedItem.objects.create(tag=tags[index % len(tags)], content_type=content_type, object_id=product.pk)
+            LikedItem.objects.create(user=cls.user, content_type=content_type, object_id=product.pk)
+            cls.products.append(product)
+
+    def setUp(self):
+        customer_ids.clear()
+        clear_caches()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self):
+        cart = models.Cart.objects.create()
+        models.CartItem.objects.bulk_create([
+            models.CartItem(cart=cart, product=product, quantity=2) for product in self.products
+        ])
+        return cart
+
+    def test_product_list(self):
+        with self.assertNumQueries(5):
+            response = self.client.get('/store/products/')
+        self.assertEqual(len(response.data['results']), self.products_per_page)
+
+    def test_product_keyset_list(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/store/products/', {'pagination': 'keyset', 'ordering': '-effective_price'})
+        self.assertEqual(len(response.data['results']), self.products_per_page)
+
+    def test_product_detail(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/store/products/{self.products[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_collection_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/store/collection/')
+        self.assertEqual(len(response.data), 3)
+
+    def test_cart_retrieve(self):
+        cart = self.fill_cart()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/store/carts/{cart.pk}/')
+        self.assertEqual(len(response.data['items']), len(self.products))
+
+    def test_order_list(self):
+        for _ in range(3):
+            self.client.post('/store/orders/', {'cart_id': self.fill_cart().pk})
+        customer_ids.clear()
+        with self.assertNumQueries(3):
+            response = self.client.get('/store/orders/')
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data[0]['items']), len(self.products))
+
+    def test_checkout(self):
+        cart = self.fill_cart()
+        with self.assertNumQueries(15):
+            response = self.client.post('/store/orders/', {'cart_id': cart.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), len(self.products))
+
+
+# Replica reads skip the cache while a version is younger than STICKY_SECONDS.
+@override_settings(STORE_RESPONSE_CACHE={'ENABLED': True, 'ALIAS': 'default', 'ALLOW_LOCAL_MEMORY': True},
+                   REPLICA_ROUTING=PRIMARY_ONLY)
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = models.Collection.objects.create(title='Collection')
+        cls.promotion = models.Promotion.objects.create(discount=0.1)
+        cls.product = models.Product.objects.create(
+            title='Product', slug='product', description='Product', unit_price=Decimal(10), inventory=100,
+            collection=cls.collection,
+        )
+        cls.product.promotion.add(cls.promotion)
+
+    def setUp(self):
+        caches['default'].clear()
+        clear_caches()
+
+    def assertChanged(self, url, change):
+        etag = self.client.get(url)['ETag']
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_not_modified(self):
+        response = self.client.get('/store/products/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/store/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_hit(self):
+        first = self.client.get(f'/store/products/{self.product.pk}/')
+        with self.assertNumQueries(0):
+            second = self.client.get(f'/store/products/{self.product.pk}/')
+        self.assertEqual((second.data, second['ETag']), (first.data, first['ETag']))
+
+    def test_product_changed(self):
+        def rename():
+            self.product.title = 'Renamed'
+            self.product.save()
+        response = self.assertChanged('/store/products/', rename)
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+        response = self.assertChanged(f'/store/products/{self.product.pk}/', rename)
+        self.assertEqual(response.data['title'], 'Renamed')
+
+    def test_product_moved_to_another_collection(self):
+        other = models.Collection.objects.create(title='Other')
+
+        def move():
+            self.product.collection = other
+            self.product.save(update_fields=['collection'])
+        response = self.assertChanged('/store/collection/', move)
+        self.assertEqual({row['id']: row['product_count'] for row in response.data}, {self.collection.pk: 0, other.pk: 1})
+
+    def test_collection_changed(self):
+        def rename():
+            self.collection.title = 'Renamed'
+            self.collection.save()
+        response = self.assertChanged('/store/collection/', rename)
+        self.assertEqual(response.data[0]['title'], 'Renamed')
+
+    def test_promotion_changed(self):
+        def deepen():
+            self.promotion.discount = 0.5
+            self.promotion.save()
+        response = self.assertChanged(f'/store/products/{self.product.pk}/', deepen)
+        self.assertEqual(response.data['effective_price'], Decimal('5.00'))
+
+    def test_promotion_removed(self):
+        response = self.assertChanged('/store/products/', lambda: self.product.promotion.remove(self.promotion))
+        self.assertEqual(response.data['results'][0]['effective_price'], Decimal('10.00'))
+
+    @override_settings(STORE_RESPONSE_CACHE={'ENABLED': True, 'ALIAS': 'default'})
+    def test_local_memory_refused(self):
+        response = self.client.get('/store/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertEqual([message.id for message in checks.run_checks()], ['store.W001'])
+
+
+@skipIf(renderers.orjson is None, 'orjson is not installed')
+@override_settings(STORE_RESPONSE_CACHE={'ENABLED': False}, REPLICA_ROUTING=PRIMARY_ONLY)
+class ReadPathTests(APITestCase):
+    """The values() read path and orjson produce the same bytes as serializers and JSONRenderer."""
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title='Caf\u00e9')
+        promotion = models.Promotion.objects.create(discount=0.15)
+        user = get_user_model().objects.create_user(username='shopper', password='secret')
+        content_type = ContentType.objects.get_for_model(models.Product)
+        tag = Tag.objects.create(label='\u2603 winter')
+        for index in range(3):
+            product = models.Product.objects.create(
+                title=f'Line\u2028separated \U0001F600 {index}', slug=f'product-{index}', description='"quoted"',
+                unit_price=Decimal('19.99') + index, inventory=index, collection=collection,
+            )
+            product.promotion.add(promotion)
+            TaggedItem.objects.create(tag=tag, content_type=content_type, object_id=product.pk)
+            LikedItem.objects.create(user=user, content_type=content_type, object_id=product.pk)
+        cls.user = user
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, fast_read, fast_json):
+        plans = []
+
+        def get_read_plan(*args):
+            plans.append(read_plan(*args) if fast_read else None)
+            return plans[-1]
+        read_plan = fastpath.get_read_plan
+        with mock.patch.object(fastpath, 'get_read_plan', get_read_plan), \
+                mock.patch.object(renderers, 'orjson', renderers.orjson if fast_json else None):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The fast path must actually have been taken.
+        self.assertEqual(plans and plans[0] is not None, fast_read)
+        return response.content
+
+    def assertSameBytes(self, url):
+        expected = self.get(url, fast_read=False, fast_json=False)
+        for fast_read, fast_json in combinations([False, True], repeat=2):
+            with self.subTest(fast_read=fast_read, fast_json=fast_json):
+                self.assertEqual(self.get(url, fast_read, fast_json), expected)
+        return expected
+
+    def test_product_list(self):
+        self.assertIn(b'\\u2028', self.assertSameBytes('/store/products/'))
+
+    def test_sparse_product_list(self):
+        self.assertSameBytes('/store/products/?fields=id,title,effective_price,collection')
+
+
+class CustomerIdTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='newcomer', email='newcomer@example.com',
+                                                        password='secret')
+
+    def setUp(self):
+        customer_ids.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_created_elsewhere_is_found(self):
+        self.assertEqual(self.client.get('/store/orders/').data, [])
+        # bulk_create() sends no post_save, like a write made by another process.
+        customer, = models.Customer.objects.bulk_create([models.Customer(user=self.user)])
+        order = models.Order.objects.create(customer=customer)
+        self.assertEqual([row['id'] for row in self.client.get('/store/orders/').data], [order.pk])
+        self.assertEqual(customer_ids.get(self.user.pk), customer.pk)
+
+    def test_deleted_profile_is_evicted(self):
+        customer = models.Customer.objects.create(user=self.user)
+        self.assertEqual(self.client.get('/store/customers/me/').data['id'], customer.pk)
+        customer.delete()
+        self.assertIsNone(customer_ids.get(self.user.pk))
+        self.assertIsNone(self.client.get('/store/customers/me/').data['id'])
+
+    def test_me_get_is_read_only(self):
+        response = self.client.get('/store/customers/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['id'])
+        self.assertFalse(models.Customer.objects.filter(user=self.user).exists())
+
+        response = self.client.put('/store/customers/me/', {'phone': '5550100'})
+        self.assertEqual(response.status_code, 200)
+        customer = models.Customer.objects.get(user=self.user)
+        self.assertEqual((response.data['id'], customer.phone), (customer.pk, '5550100'))
+        self.assertEqual(self.client.get('/store/customers/me/').data['id'], customer.pk)
+
+
+class PurgeAbandonedCartsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title='Collection')
+        cls.products = [
+            models.Product.objects.create(title=f'Product {index}', slug=f'product-{index}', unit_price=Decimal(10),
+                                          inventory=10, collection=collection)
+            for index in range(2)
+        ]
+
+    def make_cart(self, age_days, items=2):
+        cart = models.Cart.objects.create()
+        models.Cart.objects.filter(pk=cart.pk).update(created_at=timezone.now() - timedelta(days=age_days))
+        models.CartItem.objects.bulk_create([
+            models.CartItem(cart=cart, product=product, quantity=1) for product in self.products[:items]
+        ])
+        return cart
+
+    def purge(self, **kwargs):
+        with mock.patch('store.tasks.time.sleep') as sleep:
+            result = tasks.purge_abandoned_carts(**kwargs)
+        result.pop('seconds')
+        return result, sleep.call_count
+
+    def test_only_carts_past_the_ttl(self):
+        old = [self.make_cart(40, items=2), self.make_cart(31, items=1), self.make_cart(31, items=0)]
+        fresh = self.make_cart(29)
+        self.assertEqual(self.purge(ttl_days=30), ({'carts': 3, 'items': 3}, 0))
+        self.assertEqual(list(models.Cart.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(models.CartItem.objects.filter(cart__in=old).exists())
+        self.assertEqual(models.CartItem.objects.filter(cart=fresh).count(), 2)
+
+    def test_chunks_pause_between_them(self):
+        for _ in range(5):
+            self.make_cart(40)
+        self.assertEqual(self.purge(ttl_days=30, chunk_size=2), ({'carts': 5, 'items': 10}, 2))
+        self.assertFalse(models.Cart.objects.exists())
+
+    def test_last_full_chunk_is_followed_by_an_empty_one(self):
+        for _ in range(4):
+            self.make_cart(40)
+        self.assertEqual(self.purge(ttl_days=30, chunk_size=2), ({'carts': 4, 'items': 8}, 2))
+
+    @override_settings(CART_PURGE={'TTL_DAYS': 7, 'CHUNK_SIZE': 1})
+    def test_settings_supply_the_defaults(self):
+        self.make_cart(8)
+        self.make_cart(8)
+        self.make_cart(6)
+        self.assertEqual(self.purge(), ({'carts': 2, 'items': 4}, 2))
+        self.assertEqual(models.Cart.objects.count(), 1)
+
+    def test_nothing_to_purge(self):
+        self.make_cart(1)
+        self.assertEqual(self.purge(), ({'carts': 0, 'items': 0}, 0))
+
+
+class SeedStoreTests(TestCase):
+    def seed(self, *args):
+        call_command('seed_store', '--customers=3', '--collections=2', '--products=5', '--orders=2', '--reviews=2',
+                     '--tags=2', '--tagged-items=3', '--likes=3', '--chunk-size=2', *args, stdout=StringIO())
+        return models.Product.objects.order_by('pk')
+
+    def found(self, products):
+        backend = search.get_search_backend()
+        return [backend.search(models.Product.objects.all(), product.title).filter(pk=product.pk).exists()
+                for product in products]
+
+    def test_products_indexed_and_priced_once(self):
+        backend = type(search.get_search_backend())
+        with mock.patch.object(backend, 'index', autospec=True) as index, \
+                mock.patch.object(backend, 'rebuild', autospec=True, side_effect=backend.rebuild) as rebuild:
+            products = self.seed()
+        self.assertEqual((index.call_count, rebuild.call_count), (0, 1))
+        self.assertEqual(self.found(products), [True] * 5)
+        self.assertEqual(models.ProductPrice.objects.count(), 5)
+
+    def test_skip_search_index(self):
+        products = self.seed('--skip-search-index')
+        self.assertEqual(self.found(products), [False] * 5)
+        self.assertEqual(models.ProductPrice.objects.count(), 5)
+        # Bulk writes after seeding are indexed again.
+        models.Product.objects.filter(pk=products[0].pk).update(title='Reindexed')
+        self.assertEqual(self.found(products[:1]), [True])
+
+
+@override_settings(STORE_RESPONSE_CACHE={'ENABLED': False}, REPLICA_ROUTING=PRIMARY_ONLY)
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title='Collection')
+        # Three prices for 23 products, so most pages start and end inside a tie.
+        cls.products = [
+            models.Product.objects.create(title=f'Product {index}', slug=f'product-{index}',
+                                          unit_price=Decimal(10 + index % 3), inventory=1, collection=collection)
+            for index in range(23)
+        ]
+
+    def get(self, url, params=None, status=200):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        return response.data
+
+    def walk(self, params):
+        pages, data = [], self.get('/store/products/', {'pagination': 'keyset', **params})
+        while True:
+            pages.append([row['id'] for row in data['results']])
+            if data['next'] is None:
+                return pages, data
+            data = self.get(data['next'])
+
+    def expected(self, descending):
+        order = sorted(self.products, key=lambda product: (product.unit_price, product.pk), reverse=descending)
+        return [product.pk for product in order]
+
+    def test_cursor_round_trip_across_ties(self):
+        for ordering in ['unit_price', '-unit_price', 'id', '-effective_price']:
+            with self.subTest(ordering=ordering):
+                pages, last = self.walk({'ordering': ordering})
+                self.assertEqual([len(page) for page in pages], [10, 10, 3])
+                ids = [pk for page in pages for pk in page]
+                if ordering == 'id':
+                    self.assertEqual(ids, sorted(product.pk for product in self.products))
+                else:
+                    self.assertEqual(ids, self.expected(ordering.startswith('-')))
+
+                # And back again from the last page.
+                backwards, data = [], last
+                while data['previous'] is not None:
+                    data = self.get(data['previous'])
+                    backwards.append([row['id'] for row in data['results']])
+                self.assertEqual(backwards, pages[-2::-1])
+
+    def cursor(self, payload):
+        return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_invalid_cursors_are_rejected(self):
+        first = self.get('/store/products/', {'pagination': 'keyset', 'ordering': 'unit_price'})
+        position = [10, self.products[0].pk]
+        cursors = {
+            'not base64': '%%%',
+            'not json': urlsafe_b64encode(b'{').decode(),
+            'missing keys': self.cursor({'o': 'unit_price'}),
+            'other ordering': self.cursor({'o': 'last_update', 'd': False, 'p': position, 'r': False}),
+            'other direction': self.cursor({'o': 'unit_price', 'd': True, 'p': position, 'r': False}),
+            'short position': self.cursor({'o': 'unit_price', 'd': False, 'p': [10], 'r': False}),
+            'wrong type': self.cursor({'o': 'unit_price', 'd': False, 'p': ['cheap', 1], 'r': False}),
+            'null': self.cursor({'o': 'unit_price', 'd': False, 'p': [None, 1], 'r': False}),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name), self.assertLogs('django.request', 'WARNING'):
+                data = self.get(replace_query_param(first['next'], 'cursor', cursor), status=404)
+                self.assertEqual(data['detail'], 'Invalid cursor')
+
+    def test_count_modes(self):
+        params = {'pagination': 'keyset', 'ordering': 'unit_price', 'unit_price__lt': 12}
+        self.assertNotIn('count', self.get('/store/products/', params))
+        exact = self.get('/store/products/', {**params, 'count': 'exact'})
+        self.assertEqual((exact['count'], exact['count_is_estimate']), (16, False))
+        # Databases without a planner estimate count exactly.
+        estimate = self.get('/store/products/', {**params, 'count': 'estimate'})
+        self.assertEqual((estimate['count'], estimate['count_is_estimate']), (16, False))
+        with mock.patch('store.pagination.planner_count', return_value=15) as planner_count:
+            estimate = self.get('/store/products/', {**params, 'count': 'estimate'})
+        self.assertEqual((estimate['count'], estimate['count_is_estimate']), (15, True))
+        planner_count.assert_called_once()
+
+
+class SearchBackendTestsMixin:
+    """Searching and index maintenance; subclasses choose the backend through STORE_SEARCH_BACKEND."""
+    def setUp(self):
+        search._backends.clear()
+        self.addCleanup(search._backends.clear)
+        self.collection = models.Collection.objects.create(title='Collection')
+        self.scarf = self.create('Red wool scarf', 'A warm winter accessory')
+        self.blue_scarf = self.create('Blue cotton scarf', 'Light and soft')
+        self.boots = self.create('Red leather boots', 'Waterproof soles')
+
+    def create(self, title, description, index=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return models.Product.objects.create(title=title, description=description, slug=f'{title.lower()}-{index}',
+                                                 unit_price=Decimal(10), inventory=1, collection=self.collection)
+
+    def search(self, terms):
+        backend = search.get_search_backend()
+        return sorted(backend.search(models.Product.objects.all(), terms).values_list('pk', flat=True))
+
+    def test_terms_are_prefixes_and_all_must_match(self):
+        self.assertEqual(self.search('scar'), sorted([self.scarf.pk, self.blue_scarf.pk]))
+        self.assertEqual(self.search('RED scarf'), [self.scarf.pk])
+        self.assertEqual(self.search('waterpro'), [self.boots.pk])
+        self.assertEqual(self.search('red sandals'), [])
+        self.assertEqual(self.search('!!'), [])
+
+    def test_search_filter(self):
+        response = self.client.get('/store/products/', {'search': 'red'})
+        self.assertEqual(sorted(row['id'] for row in response.data['results']), sorted([self.scarf.pk, self.boots.pk]))
+
+    def test_saved_product_is_reindexed(self):
+        self.search('scarf')
+        self.scarf.title = 'Red wool shawl'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scarf.save()
+        self.assertEqual(self.search('scarf'), [self.blue_scarf.pk])
+        self.assertEqual(self.search('shawl'), [self.scarf.pk])
+
+    def test_created_product_is_indexed(self):
+        self.search('scarf')
+        hat = self.create('Woolly hat', 'Knitted')
+        self.assertEqual(self.search('wool'), sorted([self.scarf.pk, hat.pk]))
+
+    def test_deleted_product_is_removed(self):
+        self.search('scarf')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blue_scarf.delete()
+        self.assertEqual(self.search('scarf'), [self.scarf.pk])
+
+    def test_bulk_update_is_reindexed(self):
+        self.search('scarf')
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Product.objects.filter(pk__in=[self.scarf.pk, self.blue_scarf.pk]).update(description='Silk')
+        self.assertEqual(self.search('silk'), sorted([self.scarf.pk, self.blue_scarf.pk]))
+        self.assertEqual(self.search('warm'), [])
+
+    def test_bulk_create_is_indexed(self):
+        self.search('scarf')
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Product.objects.bulk_create([
+                models.Product(title='Silk scarf', description='Printed', slug='silk-scarf', unit_price=Decimal(10),
+                               inventory=1, collection=self.collection),
+            ])
+        self.assertEqual(len(self.search('scarf')), 3)
+
+    def test_price_update_keeps_the_index(self):
+        self.search('scarf')
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Product.objects.filter(pk=self.scarf.pk).update(unit_price=Decimal(20))
+        self.assertEqual(self.search('wool'), [self.scarf.pk])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 needs SQLite')
+@override_settings(STORE_SEARCH_BACKEND='sqlite', STORE_RESPONSE_CACHE={'ENABLED': False},
+                   REPLICA_ROUTING=PRIMARY_ONLY)
+class SQLiteFTSBackendTests(SearchBackendTestsMixin, APITestCase):
+    pass
+
+
+@override_settings(STORE_SEARCH_BACKEND='python', STORE_RESPONSE_CACHE={'ENABLED': False},
+                   REPLICA_ROUTING=PRIMARY_ONLY)
+class InvertedIndexBackendTests(SearchBackendTestsMixin, APITestCase):
+    def test_titles_rank_above_descriptions(self):
+        sock = self.create('Ankle sock', 'Made of red wool')
+        backend = search.get_search_backend()
+        ranked = backend.search(models.Product.objects.all(), 'wool').values_list('pk', flat=True)
+        self.assertEqual(list(ranked), [self.scarf.pk, sock.pk])
+
+
+# InnoDB FULLTEXT indexes only see committed rows.
+@skipUnless(connection.vendor == 'mysql', 'FULLTEXT search needs MySQL')
+@override_settings(STORE_SEARCH_BACKEND='mysql', STORE_RESPONSE_CACHE={'ENABLED': False},
+                   REPLICA_ROUTING=PRIMARY_ONLY)
+class MySQLFullTextBackendTests(SearchBackendTestsMixin, TransactionTestCase):
+    @contextmanager
+    def captureOnCommitCallbacks(self, execute=False):
+        # Autocommit: on_commit() callbacks have already run.
+        yield []
+
+
+class MySQLFullTextQueryTests(SimpleTestCase):
+    def test_boolean_mode_prefix_query(self):
+        queryset = search.MySQLFullTextBackend().search(models.Product.objects.all(), 'Red  wool-scarf!')
+        rank = queryset.query.annotations['search_rank']
+        self.assertIn('MATCH (store_product.title, store_product.description) AGAINST (%s IN BOOLEAN MODE)', rank.sql)
+        self.assertEqual(rank.params, ['+red* +wool* +scarf*'])
+
+    def test_no_terms(self):
+        queryset = search.MySQLFullTextBackend().search(models.Product.objects.all(), ' ,. ')
+        self.assertTrue(queryset.query.is_empty())
+
+
+@override_settings(STORE_RESPONSE_CACHE={'ENABLED': False}, REPLICA_ROUTING=PRIMARY_ONLY)
+class BulkImportExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(username='admin', email='admin@example.com', password='secret',
+                                                         is_staff=True)
+        cls.collection = models.Collection.objects.create(title='Collection')
+        cls.other = models.Collection.objects.create(title='Other')
+        cls.products = [
+            models.Product.objects.create(title=f'Product {index}', slug=f'product-{index}', unit_price=Decimal('9.50'),
+                                          inventory=index, collection=cls.collection if index % 2 else cls.other)
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.admin)
+
+    def post(self, body, content_type, status=200):
+        response = self.client.post('/store/products/import/', body, content_type=content_type)
+        self.assertEqual(response.status_code, status)
+        return response.data
+
+    def ndjson(self, *rows):
+        return ''.join((row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows)
+
+    def test_csv_rows_fail_individually(self):
+        c = self.collection.pk
+        result = self.post(
+            'title,slug,description,unit_price,inventory,collection\n'
+            f'Lamp,lamp,,12.00,3,{c}\n'
+            f'Chair,chair,,cheap,3,{c}\n'
+            'Desk,desk,,80.00,1,999\n'
+            f',stool,,5.00,1,{c}\n'
+            f'Shelf,shelf,Oak,30.00,2,{c}\n',
+            'text/csv',
+        )
+        self.assertEqual((result['created'], result['updated'], result['failed']), (2, 0, 3))
+        self.assertEqual([(error['row'], list(error['errors'])) for error in result['errors']],
+                         [(2, ['unit_price']), (3, ['collection']), (4, ['title'])])
+        lamp = models.Product.objects.get(slug='lamp')
+        self.assertEqual((lamp.unit_price, lamp.description, lamp.collection_id), (Decimal('12.00'), None, c))
+
+    def test_ndjson_upserts_by_id(self):
+        existing = self.products[0]
+        row = {'slug': 'updated', 'unit_price': '20.00', 'inventory': 7, 'collection': self.collection.pk}
+        result = self.post(self.ndjson(
+            {'id': existing.pk, 'title': 'First', **row},
+            {'id': 9000, 'title': 'New with an id', **row},
+            '{"title": ',
+            {'id': existing.pk, 'title': 'Second', **row},
+        ), 'application/x-ndjson')
+        self.assertEqual((result['created'], result['updated'], result['failed']), (1, 1, 1))
+        self.assertEqual(result['errors'][0]['row'], 3)
+        self.assertIn('Invalid JSON', result['errors'][0]['errors']['non_field_errors'][0])
+        existing.refresh_from_db()
+        # The later row for an id wins.
+        self.assertEqual((existing.title, existing.inventory, existing.collection_id),
+                         ('Second', 7, self.collection.pk))
+        self.assertEqual(models.Product.objects.get(pk=9000).title, 'New with an id')
+        self.collection.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.collection.product_count, self.other.product_count), (4, 2))
+
+    def test_errors_keep_their_row_numbers_across_batches(self):
+        rows = [{'title': f'Row {index}', 'slug': f'row-{index}', 'unit_price': '5.00', 'inventory': 1,
+                 'collection': self.collection.pk if index % 3 else 999} for index in range(1, 8)]
+        result = bulk.import_products(iter(rows), batch_size=2)
+        self.assertEqual((result['created'], result['failed']), (5, 2))
+        self.assertEqual([error['row'] for error in result['errors']], [3, 6])
+
+    def test_undecodable_stream_stops_the_import(self):
+        body = 'title,slug,unit_price,inventory,collection\n'.encode() + b'\xff\xfe,bad,1,1,1\n'
+        result = self.post(body, 'text/csv', status=400)
+        self.assertIn('Import stopped after writing 0 rows', result['error'])
+
+    def test_import_needs_an_admin(self):
+        self.client.force_authenticate(get_user_model().objects.create_user(username='shopper', email='shopper@example.com'))
+        self.post(self.ndjson({'title': 'Lamp'}), 'application/x-ndjson', status=403)
+
+    def export(self, params):
+        response = self.client.get('/store/products/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_in_id_order(self):
+        # The header, then one chunk per two products.
+        chunks = list(bulk.export_products(models.Product.objects.all(), 'csv', chunk_size=2))
+        self.assertEqual(len(chunks), 1 + 3)
+        rows = list(csv.DictReader(self.export({'format': 'csv'}).splitlines()))
+        self.assertEqual([int(row['id']) for row in rows], [product.pk for product in self.products])
+        self.assertEqual(list(rows[0]), bulk.FIELDS)
+        self.assertEqual((rows[1]['unit_price'], rows[1]['collection']), ('9.50', str(self.collection.pk)))
+
+    def test_ndjson_export_is_filtered(self):
+        lines = self.export({'format': 'ndjson', 'collection_id': self.collection.pk}).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines],
+                         [product.pk for product in self.products if product.collection_id == self.collection.pk])
+
+    def test_export_then_import_round_trips(self):
+        result = self.post(self.export({'format': 'csv'}), 'text/csv')
+        self.assertEqual((result['created'], result['updated'], result['failed']), (0, 5, 0))
+
+
+class CartItemTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title='Collection')
+        cls.products = [
+            models.Product.objects.create(title=f'Product {index}', slug=f'product-{index}', unit_price=Decimal(5),
+                                          inventory=10, collection=collection)
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.cart = models.Cart.objects.create()
+        self.url = f'/store/carts/{self.cart.pk}/items/'
+
+    def quantities(self):
+        return dict(self.cart.items.values_list('product_id', 'quantity'))
+
+    def test_add_items_accumulates_quantities(self):
+        first, second, third = (product.pk for product in self.products)
+        items = models.CartItem.objects.add_items(self.cart.pk, {first: 2, second: 1})
+        self.assertEqual(sorted((item.product_id, item.quantity) for item in items), [(first, 2), (second, 1)])
+        with self.assertNumQueries(1):
+            items = models.CartItem.objects.add_items(self.cart.pk, {first: 3, third: 4})
+        self.assertEqual(sorted((item.product_id, item.quantity) for item in items), [(first, 5), (third, 4)])
+        self.assertEqual(self.quantities(), {first: 5, second: 1, third: 4})
+
+    def test_add_items_leaves_out_unknown_products(self):
+        items = models.CartItem.objects.add_items(self.cart.pk, {self.products[0].pk: 1, 9999: 1})
+        self.assertEqual([item.product_id for item in items], [self.products[0].pk])
+        self.assertEqual(models.CartItem.objects.add_items(self.cart.pk, {}), [])
+
+    def test_add_endpoint_accumulates(self):
+        product = self.products[0].pk
+        self.client.post(self.url, {'product_id': product, 'quantity': 2})
+        response = self.client.post(self.url, {'product_id': product, 'quantity': 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['product_id'], response.data['quantity']), (product, 5))
+        self.assertEqual(self.quantities(), {product: 5})
+
+    def test_add_endpoint_rejects_unknown_product(self):
+        response = self.client.post(self.url, {'product_id': 9999, 'quantity': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_id'], ['Product does not exist'])
+
+    def test_batch_merges_repeated_products(self):
+        first, second = self.products[0].pk, self.products[1].pk
+        self.client.post(self.url, {'product_id': first, 'quantity': 1})
+        response = self.client.post(f'{self.url}batch/', {'items': [
+            {'product_id': first, 'quantity': 2}, {'product_id': second, 'quantity': 1},
+            {'product_id': first, 'quantity': 4},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted((item['product_id'], item['quantity']) for item in response.data['items']),
+                         [(first, 7), (second, 1)])
+        self.assertEqual(self.quantities(), {first: 7, second: 1})
+
+    def test_batch_with_an_unknown_product_writes_nothing(self):
+        response = self.client.post(f'{self.url}batch/', {'items': [
+            {'product_id': self.products[0].pk, 'quantity': 2}, {'product_id': 9999, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['items'], ['Product 9999 does not exist'])
+        self.assertEqual(self.quantities(), {})
+
+    def test_batch_validates_every_line(self):
+        for items in [[], [{'product_id': self.products[0].pk, 'quantity': 0}]]:
+            with self.subTest(items=items):
+                response = self.client.post(f'{self.url}batch/', {'items': items}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), {})
+
+
+@override_settings(STORE_RESPONSE_CACHE={'ENABLED': False}, REPLICA_ROUTING=PRIMARY_ONLY)
+class SparseFieldsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = models.Collection.objects.create(title='Collection')
+        cls.user = get_user_model().objects.create_user(username='shopper', email='shopper@example.com',
+                                                        password='secret')
+        content_type = ContentType.objects.get_for_model(models.Product)
+        tag = Tag.objects.create(label='tag')
+        cls.products = []
+        for index in range(3):
+            product = models.Product.objects.create(title=f'Product {index}', slug=f'product-{index}',
+                                                    unit_price=Decimal(5), inventory=1, collection=collection)
+            TaggedItem.objects.create(tag=tag, content_type=content_type, object_id=product.pk)
+            LikedItem.objects.create(user=cls.user, content_type=content_type, object_id=product.pk)
+            cls.products.append(product)
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_authenticate(self.user)
+
+    def keys(self, params, queries=None):
+        if queries is None:
+            response = self.client.get('/store/products/', params)
+        else:
+            with self.assertNumQueries(queries):
+                response = self.client.get('/store/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.data['results'][0])
+
+    def test_fields(self):
+        self.assertEqual(self.keys({'fields': 'title, id'}), ['id', 'title'])
+
+    def test_omit(self):
+        self.assertEqual(self.keys({'omit': 'tags,liked,likes_count'}),
+                         ['id', 'title', 'slug', 'inventory', 'unit_price', 'collection', 'effective_price'])
+
+    def test_fields_and_omit(self):
+        self.assertEqual(self.keys({'fields': 'id,title,tags', 'omit': 'tags'}), ['id', 'title'])
+
+    def test_unknown_names_are_ignored(self):
+        self.assertEqual(self.keys({'fields': 'id,bogus'}), ['id'])
+        self.assertEqual(len(self.keys({'omit': 'bogus'})), len(serializers.ProductSerializer.Meta.fields))
+
+    def test_omitted_fields_skip_their_queries(self):
+        # Page count, products with their prices, like counts, the user's likes and tags.
+        full = self.keys({}, queries=5)
+        self.assertEqual(len(full), len(serializers.ProductSerializer.Meta.fields))
+        self.keys({'omit': 'likes_count'}, queries=4)
+        self.keys({'omit': 'liked,tags'}, queries=3)
+        self.keys({'fields': 'id,title'}, queries=2)
+
+    def test_nested_serializers_render_in_full(self):
+        cart = models.Cart.objects.create()
+        models.CartItem.objects.create(cart=cart, product=self.products[0], quantity=1)
+        response = self.client.get(f'/store/carts/{cart.pk}/', {'fields': 'items'})
+        self.assertEqual(list(response.data), ['items'])
+        self.assertEqual(list(response.data['items'][0]['product']), ['id', 'title', 'unit_price'])
+
+    def test_writes_render_every_field(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post('/store/collection/?fields=id', {'title': 'New'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(response.data), ['id', 'title', 'product_count'])
@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework_nested import routers
 from . import views
+from .async_views import with_async_reads
 
 router = routers.DefaultRouter()
 router.register('products', views.ProductViewSet, 'products')
@@ -16,4 +17,4 @@ cart_router = routers.NestedDefaultRouter(router, 'carts', lookup='cart')
 cart_router.register('items', views.CartItemsViewSet, basename='cart-items')
 
 # URLConf
-urlpatterns = router.urls + products_router.urls + cart_router.urls
\ No newline at end of file
+urlpatterns = with_async_reads(router.urls + products_router.urls + cart_router.urls)
\ No newline at end of file
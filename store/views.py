@@ -1,5 +1,7 @@
 
-from django.db.models import Count
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_list_or_404
 from requests import Request
 from rest_framework.decorators import api_view
@@ -11,61 +13,128 @@ from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyM
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 
+from core.routers import ReadReplicaMixin
+from likes.models import LikedItem
 from store import serializers
 
+from . import bulk
 from . import models
 from . import pagination
 from . import filters
 from . import permissions
+from . import renderers
+from .caching import ConditionalCacheMixin
+from .customers import CustomerMixin
+from .fastpath import FastReadMixin
+from .optimizer import QueryOptimizerMixin, optimize_queryset
 
 # Create your views here.
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(ReadReplicaMixin, ConditionalCacheMixin, QueryOptimizerMixin, FastReadMixin, ModelViewSet):
     queryset = models.Product.objects.all()
     serializer_class = serializers.ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.ProductSearchFilter, filters.ProductOrderingFilter]
     filterset_class = filters.ProductFilter
     search_fields = ['title', 'description']
-    ordering_fields = ['unit_price', 'last_update']
+    ordering_fields = ['unit_price', 'effective_price', 'last_update']
     pagination_class = pagination.DefaultPagination
+    keyset_pagination_class = pagination.KeysetPagination
     permission_classes = [permissions.IsAdminOrReadonly]
+    renderer_classes = renderers.RENDERER_CLASSES
+    parser_classes = renderers.PARSER_CLASSES
+    cache_versions = ['products']
+    cache_detail_versions = ['product:{pk}', 'products:bulk']
     
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.keyset_pagination_class.is_requested(self.request):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_cache_vary(self, request):
+        # `liked` is per user.
+        return [request.user.pk] if request.user.is_authenticated else []
 
     def destroy(self, request, *args, **kwargs):
         if models.OrderItem.objects.filter(product_id = kwargs['pk']).count() > 0:
             return Response({"error": "Product can not be deleted because it associats with orders."})
         return super().destroy(request, *args, **kwargs)
 
-class CollectionViewSet(ModelViewSet):
-    queryset = models.Collection.objects.annotate(product_count=Count('products')).all()
+    @action(detail=True, methods=['POST', 'DELETE'], permission_classes=[IsAuthenticated])
+    def like(self, request, *args, **kwargs):
+        product = self.get_object()
+        like = {'user': request.user, 'object_id': product.pk,
+                'content_type': ContentType.objects.get_for_model(models.Product)}
+        # The like and its counter change together.
+        with transaction.atomic():
+            if request.method == 'DELETE':
+                LikedItem.objects.filter(**like).delete()
+            else:
+                # A concurrent like loses the insert on the unique constraint
+                # and fetches the winner's row; only a real insert is counted.
+                LikedItem.objects.get_or_create(**like)
+        return Response(self.get_serializer(product).data)
+
+    @action(detail=False, methods=['POST'], url_path='import', permission_classes=[IsAdminUser],
+            parser_classes=[bulk.CSVParser, bulk.NDJSONParser])
+    def bulk_import(self, request):
+        result = bulk.import_products(request.data)
+        return Response(result, status=400 if 'error' in result else 200)
+
+    @action(detail=False, methods=['GET'], permission_classes=[IsAdminUser],
+            renderer_classes=[bulk.CSVRenderer, bulk.NDJSONRenderer])
+    def export(self, request):
+        renderer = request.accepted_renderer
+        chunks = bulk.export_products(self.filter_queryset(self.get_queryset()), renderer.format)
+        response = StreamingHttpResponse(chunks, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="products.{renderer.format}"'
+        return response
+
+class CollectionViewSet(ReadReplicaMixin, ConditionalCacheMixin, QueryOptimizerMixin, FastReadMixin, ModelViewSet):
+    queryset = models.Collection.objects.all()
     serializer_class = serializers.CollectionSerializer    
     permission_classes = [permissions.IsAdminOrReadonly]
+    renderer_classes = renderers.RENDERER_CLASSES
+    parser_classes = renderers.PARSER_CLASSES
+    cache_versions = ['collections']
     def destroy(self, request, *args, **kwargs):
-        if models.Product.objects.filter(collectioin_id = kwargs['pk']).count() > 0:
+        if models.Product.objects.filter(collection_id = kwargs['pk']).count() > 0:
             return Response({"error": "Collection can not be deleted because it associats with products."})
         return super().destroy(request, *args, **kwargs)
     
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(ReadReplicaMixin, QueryOptimizerMixin, FastReadMixin, ModelViewSet):
     serializer_class = serializers.ReviewSerializer
+    renderer_classes = renderers.RENDERER_CLASSES
+    parser_classes = renderers.PARSER_CLASSES
 
     def get_queryset(self):
         return models.Review.objects.filter(product_id=self.kwargs['product_pk'])
     
     def get_serializer_context(self):
-        return {'product_id': self.kwargs['product_pk']}
+        return {**super().get_serializer_context(), 'product_id': self.kwargs['product_pk']}
 
-class CartViewSet(CreateModelMixin,
+class CartViewSet(QueryOptimizerMixin,
+                  CreateModelMixin,
                   GenericViewSet,
                   RetrieveModelMixin,
                   DestroyModelMixin):
-    queryset = models.Cart.objects.prefetch_related('items__product').all()
     serializer_class = serializers.CartSerializer
 
-class CartItemsViewSet(ModelViewSet):
+    def get_queryset(self):
+        if self.action == 'retrieve':
+            return models.Cart.objects.with_totals()
+        return models.Cart.objects.all()
+
+class CartItemsViewSet(QueryOptimizerMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
     def get_queryset(self):
-        return models.CartItem.objects.filter(cart_id=self.kwargs['cart_pk']).select_related('product')
+        return models.CartItem.objects.filter(cart_id=self.kwargs['cart_pk']).with_totals()
     
     def get_serializer_class(self):
+        if self.action == 'batch':
+            return serializers.AddCartItemsSerializer
         if self.request.method == 'POST':
             return serializers.AddCartSerializer
         elif self.request.method == 'PATCH':
@@ -73,18 +142,31 @@ class CartItemsViewSet(ModelViewSet):
         return serializers.CartItemSerializer
     
     def get_serializer_context(self):
-        return {'cart_id': self.kwargs['cart_pk']}
+        return {**super().get_serializer_context(), 'cart_id': self.kwargs['cart_pk']}
+
+    @action(detail=False, methods=['POST'])
+    def batch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=201)
     
-class CustomerViewSet(ModelViewSet):
+class CustomerViewSet(CustomerMixin, QueryOptimizerMixin, FastReadMixin, ModelViewSet):
     queryset = models.Customer.objects.all()
     serializer_class = serializers.CustomerSerializer
     permission_classes = [DjangoModelPermissions]
+    renderer_classes = renderers.RENDERER_CLASSES
+    parser_classes = renderers.PARSER_CLASSES
 
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     def me(self, request: Request):
-        (customer, isCreated) = models.Customer.objects.get_or_create(user_id=request.user.id)
+        if request.customer_id is not None:
+            customer = models.Customer.objects.get(pk=request.customer_id)
+        else:
+            # Not saved until the first PUT, so GET stays read-only.
+            customer = models.Customer(user_id=request.user.id)
         if request.method == 'GET':
-            serializer = serializers.CustomerSerializer(customer)
+            serializer = serializers.CustomerSerializer(customer, context=self.get_serializer_context())
             return Response(serializer.data)
         elif request.method == 'PUT':
             serializer = serializers.CustomerSerializer(customer, data=request.data)
@@ -92,9 +174,11 @@ class CustomerViewSet(ModelViewSet):
             serializer.save()
             return Response(serializer.data)
 
-class OrderViewSet(ModelViewSet):
-    http_method_names = ['get', 'patch', 'delete', 'head', 'options']
+class OrderViewSet(CustomerMixin, QueryOptimizerMixin, FastReadMixin, ModelViewSet):
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
     permission_classes = [IsAuthenticated]
+    renderer_classes = renderers.RENDERER_CLASSES
+    parser_classes = renderers.PARSER_CLASSES
 
     def get_permissions(self):
         if self.request.method in ['PATCH', 'DELETE']:
@@ -105,6 +189,7 @@ class OrderViewSet(ModelViewSet):
         serializer = serializers.CreateOrderSerializer(data=request.data, context={'user': self.request.user})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
+        order = optimize_queryset(models.Order.objects.all(), serializers.OrderSerializer()).get(pk=order.pk)
         serializer = serializers.OrderSerializer(order)
         return Response(serializer.data)
     
@@ -119,5 +204,4 @@ class OrderViewSet(ModelViewSet):
         user = self.request.user
         if user.is_staff:
             return models.Order.objects.all()
-        customer_id = models.Customer.objects.only('id').get(user_id = user.id)
-        return models.Order.objects.filter(customer_id=customer_id)
\ No newline at end of file
+        return models.Order.objects.filter(customer_id=self.request.customer_id)
\ No newline at end of file
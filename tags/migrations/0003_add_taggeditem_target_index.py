@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0002_rename_title_tag_label'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['content_type', 'object_id'], name='tags_taggeditem_target_idx'),
+        ),
+    ]
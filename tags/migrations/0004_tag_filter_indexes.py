@@ -0,0 +1,22 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0003_add_taggeditem_target_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='label',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['tag', 'content_type', 'object_id'], name='tags_taggeditem_tag_idx'),
+        ),
+    ]
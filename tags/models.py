@@ -1,17 +1,66 @@
+from collections import defaultdict
+
 from django.db import models
+from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 # Create your models here.
 class Tag(models.Model):
-    label = models.CharField(max_length=255)
+    label = models.CharField(max_length=255, db_index=True)
 
     def __str__(self) -> str:
         return self.label
 
+class TaggedItemQuerySet(models.QuerySet):
+    def for_objects(self, objects):
+        """
+        {(content_type_id, object_id): [tag labels]} for `objects`, which may
+        be instances of several models, in one query. Objects without tags are
+        left out.
+        """
+        content_types = ContentType.objects.db_manager(self.db).get_for_models(*{type(obj) for obj in objects})
+        targets = defaultdict(set)
+        for obj in objects:
+            targets[content_types[type(obj)].id].add(obj.pk)
+        return self.for_targets(targets)
+
+    def for_model(self, model, ids):
+        """{id: [tag labels]} for the `ids` of `model` that have tags, in one query."""
+        content_type = ContentType.objects.db_manager(self.db).get_for_model(model)
+        tags = self.for_targets({content_type.id: ids})
+        return {object_id: labels for (_, object_id), labels in tags.items()}
+
+    def for_targets(self, targets):
+        condition = Q()
+        for content_type_id, ids in targets.items():
+            if ids:
+                condition |= Q(content_type_id=content_type_id, object_id__in=ids)
+        if not condition:
+            return {}
+        tags = defaultdict(list)
+        items = self.filter(condition).order_by('tag__label') \
+            .values_list('content_type_id', 'object_id', 'tag__label')
+        for content_type_id, object_id, label in items:
+            tags[content_type_id, object_id].append(label)
+        return dict(tags)
+
+    def object_ids(self, model, labels):
+        """A subquery of the ids of `model` objects tagged with any of `labels`."""
+        content_type = ContentType.objects.db_manager(self.db).get_for_model(model)
+        return self.filter(content_type=content_type, tag__label__in=labels).values('object_id')
+
 class TaggedItem(models.Model):
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
     # GenericType for product
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveBigIntegerField()
-    content_object =  GenericForeignKey()
\ No newline at end of file
+    content_object =  GenericForeignKey()
+
+    objects = TaggedItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='tags_taggeditem_target_idx'),
+            models.Index(fields=['tag', 'content_type', 'object_id'], name='tags_taggeditem_tag_idx'),
+        ]